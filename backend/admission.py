@@ -0,0 +1,149 @@
+import collections
+import dataclasses
+import math
+import threading
+import time
+from collections.abc import Callable
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from . import metrics
+
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Scraping and static files are never limited.
+EXEMPT_PREFIXES = ("/metrics", "/assets")
+
+# Writes which are only speculative, shed as early as reads.
+LOW_PRIORITY_PATHS = {"/submissions/prefetch"}
+
+
+@dataclasses.dataclass
+class TokenBucket:
+    tokens: float
+    updated_at: float
+
+
+class AdmissionController:
+    """Per-client token buckets and priority-based load shedding.
+
+    Every client may make `rate` requests per second on average, with bursts of
+    up to `burst` requests. Independently, at most `max_inflight` requests are
+    handled at once. Reads are shed earlier, once `read_fraction` of that
+    capacity is taken, so that writes moving the game forward still get through.
+    """
+
+    def __init__(
+        self,
+        rate: float | None,
+        burst: int,
+        max_inflight: int | None,
+        read_fraction: float,
+        max_clients: int = 10_000,
+        identify: Callable[[str], str | None] | None = None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_inflight = max_inflight
+        self.max_inflight_reads = (
+            max(int(max_inflight * read_fraction), 1)
+            if max_inflight is not None
+            else None
+        )
+        self.max_clients = max_clients
+        # Username of a bearer token, if it is valid.
+        self.identify = identify
+
+        self.inflight = 0
+
+        self._lock = threading.Lock()
+        self._buckets: collections.OrderedDict[str, TokenBucket] = (
+            collections.OrderedDict()
+        )
+
+    def _take_token(self, client: str) -> float | None:
+        """Seconds until the client may retry, or `None` if admitted."""
+        now = time.monotonic()
+
+        bucket = self._buckets.pop(client, None)
+        if bucket is None:
+            bucket = TokenBucket(tokens=self.burst, updated_at=now)
+        bucket.tokens = min(
+            bucket.tokens + (now - bucket.updated_at) * self.rate, self.burst
+        )
+        bucket.updated_at = now
+
+        # Least recently seen clients are forgotten first.
+        self._buckets[client] = bucket
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+        if bucket.tokens < 1:
+            return (1 - bucket.tokens) / self.rate
+
+        bucket.tokens -= 1
+        return None
+
+    def admit(self, client: str, write: bool) -> tuple[str, float] | None:
+        """Reason for rejecting the request and seconds until a retry, if any.
+
+        Admitted requests must be passed to `release` when they are done.
+        """
+        with self._lock:
+            if self.rate is not None:
+                retry_after = self._take_token(client)
+                if retry_after is not None:
+                    return "rate_limit", retry_after
+
+            limit = self.max_inflight if write else self.max_inflight_reads
+            if limit is not None and self.inflight >= limit:
+                return "overload", 1.0
+
+            self.inflight += 1
+            return None
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
+
+
+class AdmissionMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        controller: AdmissionController | None = getattr(
+            request.app.state, "admission", None
+        )
+        if controller is None or request.url.path.startswith(EXEMPT_PREFIXES):
+            return await call_next(request)
+
+        # Players are told apart by their verified name, everybody else by
+        # address, so that made up tokens do not get buckets of their own.
+        client = None
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if controller.identify is not None and scheme.lower() == "bearer":
+            username = controller.identify(token)
+            client = f"user:{username}" if username is not None else None
+        if client is None:
+            client = request.client.host if request.client else ""
+        write = (
+            request.method not in SAFE_METHODS
+            and request.url.path not in LOW_PRIORITY_PATHS
+        )
+        priority = "write" if write else "read"
+
+        rejection = controller.admit(client, write)
+        if rejection is not None:
+            reason, retry_after = rejection
+            metrics.requests_shed.inc(reason=reason, priority=priority)
+            return JSONResponse(
+                {"detail": "Too many requests, retry later."},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+        try:
+            return await call_next(request)
+        finally:
+            controller.release()
@@ -0,0 +1,122 @@
+import dataclasses
+import functools
+import gzip
+import json
+import os
+import pathlib
+import re
+import threading
+from collections.abc import Iterator
+
+from . import models
+
+
+SEASON_PATTERN = re.compile(r"rounds-(\d+)-(\d+)-(\d+)\.json\.gz")
+
+
+@dataclasses.dataclass(frozen=True)
+class Season:
+    first_round_id: int
+    last_round_id: int
+    count: int
+    path: pathlib.Path
+
+
+class RoundArchive:
+    """Archived rounds, stored as one immutable compressed file per season."""
+
+    def __init__(self, directory: pathlib.Path, cache_size: int = 4):
+        # Only created once the first season is written, so that games which
+        # never archive leave no directory behind.
+        self.directory = directory
+
+        self._lock = threading.Lock()
+        self._seasons = sorted(
+            (
+                Season(*map(int, match.groups()), path)
+                for path in (directory.iterdir() if directory.is_dir() else ())
+                if (match := SEASON_PATTERN.fullmatch(path.name))
+            ),
+            key=lambda season: season.first_round_id,
+        )
+
+        # Only a few decompressed seasons are kept in memory.
+        self._load = functools.lru_cache(maxsize=cache_size)(self._read)
+
+    @property
+    def count(self) -> int:
+        return sum(season.count for season in self._seasons)
+
+    @staticmethod
+    def _read(path: pathlib.Path) -> tuple[models.ArchivedRound, ...]:
+        with gzip.open(path, "rt") as file:
+            return tuple(
+                models.ArchivedRound.model_validate(entry) for entry in json.load(file)
+            )
+
+    def write(self, entries: list[models.ArchivedRound]) -> Season:
+        first, last = entries[0].round.id, entries[-1].round.id
+        path = self.directory / f"rounds-{first:08d}-{last:08d}-{len(entries)}.json.gz"
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so that seasons are never partial.
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wt", compresslevel=9) as file:
+            json.dump([entry.model_dump(mode="json") for entry in entries], file)
+        os.replace(tmp_path, path)
+
+        season = Season(first, last, len(entries), path)
+        with self._lock:
+            self._seasons = sorted(
+                [
+                    *(other for other in self._seasons if other.path != path),
+                    season,
+                ],
+                key=lambda season: season.first_round_id,
+            )
+        return season
+
+    def iter_seasons(self) -> Iterator[tuple[models.ArchivedRound, ...]]:
+        """All seasons, oldest first, decompressing one at a time."""
+        for season in self._seasons:
+            yield self._read(season.path)
+
+    def iter_rounds(self) -> Iterator[models.ArchivedRound]:
+        for entries in self.iter_seasons():
+            yield from entries
+
+    def get_round(self, round_id: int) -> models.ArchivedRound | None:
+        for season in self._seasons:
+            if season.first_round_id <= round_id <= season.last_round_id:
+                return next(
+                    (
+                        entry
+                        for entry in self._load(season.path)
+                        if entry.round.id == round_id
+                    ),
+                    None,
+                )
+        return None
+
+    def get_rounds(
+        self, offset: int = 0, limit: int | None = None
+    ) -> list[models.ArchivedRound]:
+        """Archived rounds, newest first."""
+        entries = []
+        for season in reversed(self._seasons):
+            if limit is not None and len(entries) >= limit:
+                break
+
+            # Skip whole seasons without decompressing them.
+            if offset >= season.count:
+                offset -= season.count
+                continue
+
+            season_entries = self._load(season.path)[::-1][offset:]
+            offset = 0
+
+            if limit is not None:
+                season_entries = season_entries[: limit - len(entries)]
+            entries.extend(season_entries)
+
+        return entries
@@ -0,0 +1,138 @@
+"""Write latency of `GameManager.add_vote` for votes carrying many comments.
+
+Compares the single-transaction implementation against the previous
+commit-per-comment approach:
+
+    $ uv run python -m backend.benchmarks.bench_add_vote --votes 50 --comments 20
+"""
+
+import argparse
+import pathlib
+import statistics
+import tempfile
+import time
+
+from sqlmodel import select
+
+from .. import models
+from ..config import Settings
+from ..game_manager import GameManager
+
+
+def setup_game(
+    directory: pathlib.Path, players: int, submissions: int, **settings
+) -> tuple[GameManager, list[int]]:
+    manager = GameManager(
+        Settings(
+            user_database_string="",
+            jwt_secret_key="benchmark-secret-key-of-sufficient-length",
+            datatbase_directory=directory,
+            **settings,
+        )
+    )
+    manager.setup_database()
+
+    with manager.sql_session() as session:
+        users = [models.User(name=f"player{idx}") for idx in range(players)]
+        round = models.Round(prompt="benchmark")
+        movie = models.Movie(
+            name="movie",
+            requested_name="movie",
+            poster_url="",
+            description="",
+            genre="",
+            release_date="",
+            actors="",
+            directors="",
+        )
+        session.add_all([*users, round, movie])
+        session.commit()
+
+        db_submissions = [
+            models.Submission(
+                round_id=round.id, movie_id=movie.id, submitting_user_id=users[0].id
+            )
+            for _ in range(submissions)
+        ]
+        session.add_all(db_submissions)
+        session.commit()
+
+        return manager, [submission.id for submission in db_submissions]
+
+
+def add_vote_per_comment_commit(
+    manager: GameManager, username: str, vote: models.VoteCreate
+):
+    # Previous implementation, kept as the baseline.
+    with manager.sql_session() as session:
+        user = session.exec(
+            select(models.User).where(models.User.name == username)
+        ).first()
+        user.voted_submissions.append(
+            session.get(models.Submission, vote.submission_id)
+        )
+
+        for submission_id, comment_text in vote.all_comments.items():
+            comment = models.Comment(
+                submission_id=submission_id, author_id=user.id, text=comment_text
+            )
+            session.add(comment)
+            session.commit()
+            session.refresh(comment)
+
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+
+
+def add_vote_single_transaction(
+    manager: GameManager, username: str, vote: models.VoteCreate
+):
+    manager.add_vote(username, vote)
+
+
+def run(add_vote, votes: int, comments: int) -> list[float]:
+    with tempfile.TemporaryDirectory() as directory:
+        manager, submission_ids = setup_game(
+            pathlib.Path(directory), players=votes, submissions=max(comments, 1)
+        )
+
+        vote = models.VoteCreate(
+            submission_id=submission_ids[0],
+            all_comments={
+                submission_id: f"comment on {submission_id}"
+                for submission_id in submission_ids[:comments]
+            },
+        )
+
+        timings = []
+        for idx in range(votes):
+            start = time.perf_counter()
+            add_vote(manager, f"player{idx}", vote)
+            timings.append(time.perf_counter() - start)
+
+        manager.engine.dispose()
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--votes", type=int, default=50)
+    parser.add_argument("--comments", type=int, default=20)
+    args = parser.parse_args()
+
+    for name, add_vote in [
+        ("per-comment commit", add_vote_per_comment_commit),
+        ("single transaction", add_vote_single_transaction),
+    ]:
+        timings = run(add_vote, args.votes, args.comments)
+        print(
+            f"{name:>20}: "
+            f"mean {statistics.mean(timings) * 1000:.2f} ms/vote, "
+            f"median {statistics.median(timings) * 1000:.2f} ms/vote"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""CPU time of turning a large round into its public model.
+
+Compares validating the database rows again against the trusted construction
+with `models.from_row`. Rows are built in memory, so only the conversion is
+measured and no database access:
+
+    $ uv run python -m backend.benchmarks.bench_public_models --submissions 200
+"""
+
+import argparse
+import statistics
+import time
+
+from .. import models
+
+
+def build_round(submissions: int, voters: int, comments: int) -> models.Round:
+    users = [models.User(id=idx, name=f"player{idx}") for idx in range(voters)]
+    return models.Round(
+        id=1,
+        prompt="benchmark",
+        submissions=[
+            models.Submission(
+                id=idx,
+                round_id=1,
+                movie_id=idx,
+                submitting_user_id=users[0].id,
+                submitting_user=users[0],
+                voting_users=users,
+                movie=models.Movie(
+                    id=idx,
+                    name=f"movie{idx}",
+                    requested_name=f"movie{idx}",
+                    poster_url="https://example.com/poster.jpg",
+                    description="A movie. " * 20,
+                    genre="Drama;Comedy",
+                    release_date="2000-01-01",
+                    actors="actor,https://example.com/actor.jpg",
+                    directors="director,https://example.com/director.jpg",
+                ),
+                comments=[
+                    models.Comment(
+                        submission_id=idx,
+                        author_id=users[0].id,
+                        author=users[0],
+                        text=f"comment {comment_idx}",
+                    )
+                    for comment_idx in range(comments)
+                ],
+            )
+            for idx in range(submissions)
+        ],
+    )
+
+
+def run(convert, round: models.Round, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.process_time()
+        convert(round)
+        timings.append(time.process_time() - start)
+    return timings
+
+
+def benchmark(
+    submissions: int, voters: int, comments: int, repeat: int
+) -> dict[str, float]:
+    round = build_round(submissions, voters, comments)
+
+    # Both yield the same data.
+    validated = models.RoundPublicWithSubmissions.model_validate(round)
+    constructed = models.from_row(models.RoundPublicWithSubmissions, round)
+    assert validated.model_dump() == constructed.model_dump()
+
+    return {
+        name: statistics.median(run(convert, round, repeat)) * 1000
+        for name, convert in [
+            ("model_validate", models.RoundPublicWithSubmissions.model_validate),
+            (
+                "from_row",
+                lambda round: models.from_row(models.RoundPublicWithSubmissions, round),
+            ),
+        ]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--voters", type=int, default=10)
+    parser.add_argument("--comments", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = benchmark(args.submissions, args.voters, args.comments, args.repeat)
+    for name, milliseconds in results.items():
+        print(f"{name:>14}: {milliseconds:.2f} ms CPU/round")
+    print(f"{'speedup':>14}: {results['model_validate'] / results['from_row']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
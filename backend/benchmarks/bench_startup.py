@@ -0,0 +1,114 @@
+"""Cold start time of the backend, until it is ready to serve requests.
+
+Every measurement runs in a fresh interpreter, against a new database and
+against an existing one (the common case when scaling up from zero):
+
+    $ uv run python -m backend.benchmarks.bench_startup --repeat 5 --budget-ms 1500
+
+Fails if the median total time with an existing database exceeds the budget.
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def measure_startup(directory: pathlib.Path):
+    start = time.perf_counter()
+
+    from ..config import Settings, get_settings
+    from ..main import app
+
+    imported = time.perf_counter()
+
+    app.dependency_overrides[get_settings] = lambda: Settings(
+        user_database_string="",
+        jwt_secret_key="benchmark-secret-key-of-sufficient-length",
+        datatbase_directory=directory,
+    )
+
+    async def start_app():
+        async with app.router.lifespan_context(app):
+            return time.perf_counter()
+
+    ready = asyncio.run(start_app())
+
+    print(
+        json.dumps(
+            {
+                "import_ms": (imported - start) * 1000,
+                "setup_ms": (ready - imported) * 1000,
+            }
+        )
+    )
+
+
+def run(directory: pathlib.Path) -> dict:
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-m", __spec__.name, "--child", str(directory)],
+        cwd=pathlib.Path(__file__).parents[2],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    total = time.perf_counter() - start
+
+    return {**json.loads(output.splitlines()[-1]), "total_ms": total * 1000}
+
+
+def benchmark(repeat: int) -> dict[str, dict[str, float]]:
+    timings = {"new database": [], "existing database": []}
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            timings["new database"].append(run(pathlib.Path(directory)))
+            timings["existing database"].append(run(pathlib.Path(directory)))
+
+    return {
+        name: {
+            key: statistics.median(entry[key] for entry in entries)
+            for key in entries[0]
+        }
+        for name, entries in timings.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--child", type=pathlib.Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        measure_startup(args.child)
+        return
+
+    results = benchmark(args.repeat)
+    for name, entry in results.items():
+        print(
+            f"{name:>18}: import {entry['import_ms']:.0f} ms, "
+            f"setup {entry['setup_ms']:.0f} ms, "
+            f"total incl. interpreter {entry['total_ms']:.0f} ms"
+        )
+
+    total = results["existing database"]["total_ms"]
+    if total > args.budget_ms:
+        print(
+            f"Startup took {total:.0f} ms, over the budget of {args.budget_ms:.0f} ms",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
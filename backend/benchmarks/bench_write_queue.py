@@ -0,0 +1,75 @@
+"""Latency and throughput of a burst of concurrent votes.
+
+Compares committing every vote on its own against group commits through the
+write queue:
+
+    $ uv run python -m backend.benchmarks.bench_write_queue --votes 200 --concurrency 40
+"""
+
+import argparse
+import pathlib
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import models
+from .bench_add_vote import setup_game
+
+
+def run(votes: int, concurrency: int, max_batch: int | None) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        manager, submission_ids = setup_game(
+            pathlib.Path(directory),
+            players=votes,
+            submissions=1,
+            write_queue_max_batch=max_batch,
+        )
+        vote = models.VoteCreate(
+            submission_id=submission_ids[0],
+            all_comments={submission_ids[0]: "comment"},
+        )
+
+        def add_vote(idx: int) -> float:
+            start = time.perf_counter()
+            manager.add_vote(f"player{idx}", vote)
+            return time.perf_counter() - start
+
+        # Like the thread pool running the request handlers.
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            timings = list(executor.map(add_vote, range(votes)))
+            total = time.perf_counter() - start
+
+        manager.close()
+        manager.engine.dispose()
+
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": statistics.quantiles(timings, n=20)[-1] * 1000,
+        "votes_per_second": votes / total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--votes", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    for name, max_batch in [
+        ("per-request commit", None),
+        ("group commit", args.max_batch),
+    ]:
+        results = run(args.votes, args.concurrency, max_batch)
+        print(
+            f"{name:>18}: "
+            f"median {results['median_ms']:.2f} ms/vote, "
+            f"p95 {results['p95_ms']:.2f} ms/vote, "
+            f"{results['votes_per_second']:.0f} votes/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
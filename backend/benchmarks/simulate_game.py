@@ -0,0 +1,360 @@
+"""Load test driving simulated players through complete game rounds.
+
+Every player logs in, joins, submits a movie, votes and finally looks at the
+overview, while polling the game state in between. The app either runs
+in-process with a fake metadata source that injects latency, or a running
+server is targeted via `--url`:
+
+    $ uv run python -m backend.benchmarks.simulate_game --players 8 --rounds 5
+    $ uv run python -m backend.benchmarks.simulate_game --url http://localhost:8000
+
+Per-endpoint latency percentiles and the overall throughput are reported.
+With `--profile-route`, requests to that route are profiled in-process and
+written to `--profile-output` as folded stacks (flamegraph compatible) or
+pstats files.
+
+Results can be stored with `--save-baseline` and compared against a stored
+baseline with `--baseline` (both default to `baseline.json` next to this file),
+which fails if an endpoint regressed.
+"""
+
+import argparse
+import asyncio
+import collections
+import contextlib
+import json
+import pathlib
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import TYPE_CHECKING
+
+import httpx
+
+if TYPE_CHECKING:
+    from .. import profiling
+
+
+DEFAULT_BASELINE = pathlib.Path(__file__).parent / "baseline.json"
+
+
+class FakeIMDB:
+    """Metadata source answering after a fixed delay."""
+
+    latency: float = 0.05
+
+    def get_by_name(self, name: str) -> dict:
+        time.sleep(self.latency)
+        return {
+            "name": name,
+            "actor": [],
+            "director": [],
+            "creator": [],
+            "poster": "",
+            "description": "",
+            "genre": ["Drama", "Comedy"],
+            "datePublished": "2000-01-01",
+        }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+
+    @contextlib.asynccontextmanager
+    async def measure(self, endpoint: str):
+        start = time.perf_counter()
+        yield
+        self.latencies[endpoint].append(time.perf_counter() - start)
+
+    def summary(self, duration: float) -> dict:
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            if len(values) > 1:
+                cuts = statistics.quantiles(values, n=100, method="inclusive")
+                p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+            else:
+                p50 = p95 = p99 = values[0]
+
+            endpoints[endpoint] = {
+                "count": len(values),
+                "p50_ms": p50 * 1000,
+                "p95_ms": p95 * 1000,
+                "p99_ms": p99 * 1000,
+            }
+
+        requests = sum(entry["count"] for entry in endpoints.values())
+        return {
+            "requests": requests,
+            "duration_s": duration,
+            "throughput_rps": requests / duration,
+            "endpoints": endpoints,
+        }
+
+
+class Player:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, name: str):
+        self.client = client
+        self.recorder = recorder
+        self.name = name
+        self.headers = {}
+
+    async def request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        async with self.recorder.measure(f"{method} {endpoint}"):
+            response = await self.client.request(
+                method, endpoint, headers=self.headers, **kwargs
+            )
+        response.raise_for_status()
+        return response
+
+    async def login(self, password: str):
+        response = await self.request(
+            "POST", "/token", data={"username": self.name, "password": password}
+        )
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await self.request("POST", "/users/", json={"name": self.name})
+        await self.request("GET", "/snapshot")
+
+    async def wait_for(self, state: str, poll_interval: float):
+        while True:
+            response = await self.request("GET", "/state")
+            if response.json()["state"] == state:
+                return
+            await asyncio.sleep(poll_interval)
+
+    async def submit(self, round_idx: int, poll_interval: float):
+        await self.wait_for("SubmissionState", poll_interval)
+        await self.request("GET", "/round")
+        await self.request(
+            "POST",
+            "/submissions/",
+            json={"name": f"{self.name}-movie-{round_idx}", "comment": "Great one."},
+        )
+
+    async def vote(self, poll_interval: float):
+        await self.wait_for("VotingState", poll_interval)
+        submissions = (await self.request("GET", "/round")).json()["submissions"]
+        candidates = [
+            sub for sub in submissions if sub["submitting_user"]["name"] != self.name
+        ] or submissions
+
+        await self.request(
+            "POST",
+            "/vote/",
+            json={
+                "submission_id": random.choice(candidates)["id"],
+                "all_comments": {sub["id"]: "Nice pick." for sub in submissions},
+            },
+        )
+
+    async def overview(self, poll_interval: float):
+        await self.wait_for("OverviewState", poll_interval)
+        await self.request("GET", "/snapshot")
+        await self.request("GET", "/rounds")
+        await self.request("GET", "/results")
+
+
+async def simulate(
+    client: httpx.AsyncClient,
+    players: int,
+    rounds: int,
+    poll_interval: float,
+) -> dict:
+    recorder = Recorder()
+    all_players = [Player(client, recorder, f"player{idx}") for idx in range(players)]
+
+    start = time.perf_counter()
+
+    await asyncio.gather(*(player.login("password") for player in all_players))
+
+    for round_idx in range(rounds):
+        await all_players[0].request(
+            "POST", "/round", json={"prompt": f"Prompt {round_idx}"}
+        )
+
+        await asyncio.gather(
+            *(player.submit(round_idx, poll_interval) for player in all_players)
+        )
+        await asyncio.gather(*(player.vote(poll_interval) for player in all_players))
+        await asyncio.gather(
+            *(player.overview(poll_interval) for player in all_players)
+        )
+
+    return recorder.summary(time.perf_counter() - start)
+
+
+async def simulate_in_process(
+    players: int,
+    rounds: int,
+    poll_interval: float,
+    metadata_latency: float,
+    profile: "profiling.ProfilingRequest | None" = None,
+) -> dict:
+    import imdbmovies
+
+    from .. import profiling
+    from ..config import Settings, get_settings
+    from ..main import app
+
+    if profile is not None:
+        profiling.profiler.enable(profile)
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings = Settings(
+            user_database_string=" ".join(
+                f"player{idx}:password" for idx in range(players)
+            ),
+            jwt_secret_key="benchmark-secret-key-of-sufficient-length",
+            datatbase_directory=pathlib.Path(directory),
+        )
+        app.dependency_overrides[get_settings] = lambda: settings
+
+        FakeIMDB.latency = metadata_latency
+        original_imdb, imdbmovies.IMDB = imdbmovies.IMDB, FakeIMDB
+
+        try:
+            async with app.router.lifespan_context(app):
+                async with httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app),
+                    base_url="http://benchmark",
+                    follow_redirects=True,
+                    timeout=None,
+                ) as client:
+                    return await simulate(client, players, rounds, poll_interval)
+        finally:
+            imdbmovies.IMDB = original_imdb
+            app.dependency_overrides.pop(get_settings, None)
+            profiling.profiler.disable()
+
+
+async def simulate_remote(
+    url: str, players: int, rounds: int, poll_interval: float
+) -> dict:
+    async with httpx.AsyncClient(
+        base_url=url, follow_redirects=True, timeout=None
+    ) as client:
+        return await simulate(client, players, rounds, poll_interval)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for endpoint, entry in results["endpoints"].items():
+        reference = baseline["endpoints"].get(endpoint)
+        if reference is None:
+            continue
+
+        if entry["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{endpoint}: p95 {entry['p95_ms']:.1f} ms "
+                f"(baseline {reference['p95_ms']:.1f} ms)"
+            )
+
+    if results["throughput_rps"] < baseline["throughput_rps"] / (1 + tolerance):
+        regressions.append(
+            f"throughput {results['throughput_rps']:.1f} req/s "
+            f"(baseline {baseline['throughput_rps']:.1f} req/s)"
+        )
+
+    return regressions
+
+
+def print_report(results: dict):
+    print(f"{'endpoint':<24} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, entry in results["endpoints"].items():
+        print(
+            f"{endpoint:<24} {entry['count']:>6} {entry['p50_ms']:>9.2f} "
+            f"{entry['p95_ms']:>9.2f} {entry['p99_ms']:>9.2f}"
+        )
+    print(
+        f"\n{results['requests']} requests in {results['duration_s']:.2f} s "
+        f"({results['throughput_rps']:.1f} req/s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument(
+        "--metadata-latency",
+        type=float,
+        default=0.05,
+        help="Delay of the fake metadata source in seconds (in-process only).",
+    )
+    parser.add_argument("--url", help="Benchmark a running server instead.")
+    parser.add_argument(
+        "--profile-route",
+        help="Profile every request to this route (in-process only), e.g. /rounds.",
+    )
+    parser.add_argument(
+        "--profile-mode", choices=["sample", "cprofile"], default="sample"
+    )
+    parser.add_argument(
+        "--profile-output", type=pathlib.Path, default=pathlib.Path("profiles")
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--baseline", type=pathlib.Path, nargs="?", const=DEFAULT_BASELINE
+    )
+    parser.add_argument(
+        "--save-baseline", type=pathlib.Path, nargs="?", const=DEFAULT_BASELINE
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed relative slowdown before a regression is flagged.",
+    )
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    if args.url:
+        results = asyncio.run(
+            simulate_remote(args.url, args.players, args.rounds, args.poll_interval)
+        )
+    else:
+        from .. import profiling
+
+        profile = None
+        if args.profile_route:
+            profile = profiling.ProfilingRequest(
+                route=args.profile_route, samples=None, mode=args.profile_mode
+            )
+
+        results = asyncio.run(
+            simulate_in_process(
+                args.players,
+                args.rounds,
+                args.poll_interval,
+                args.metadata_latency,
+                profile,
+            )
+        )
+
+        if profile is not None:
+            profiling.profiler.write_profiles(args.profile_output)
+
+    print_report(results)
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline:
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncGenerator
+
+from . import game_manager, metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Spectators polling `/spectate` keep the snapshot fresh for this long.
+POLL_VIEWER_TIMEOUT_SECONDS = 30
+
+# Sent to idle streams so that proxies do not close them.
+KEEPALIVE_INTERVAL_SECONDS = 15
+KEEPALIVE = b": keepalive\n\n"
+
+
+class SpectatorBroadcast:
+    """Shares one serialized snapshot per game version with all spectators.
+
+    A single task watches the game version while anybody is watching, and
+    serializes a new snapshot only when it changes. Spectators only ever get
+    the shared bytes, so they cost no database access and no serialization.
+    """
+
+    def __init__(self, manager: "game_manager.GameManager", poll_interval: float):
+        self.manager = manager
+        self.poll_interval = poll_interval
+
+        self.version: int | None = None
+        self.snapshot: bytes = b""
+        self.event: bytes = b""
+
+        self._streams = 0
+        self._last_poll = -float("inf")
+        self._wake = asyncio.Event()
+
+        # Resolved after every check and every new version, respectively.
+        self._checked = asyncio.get_running_loop().create_future()
+        self._published = asyncio.get_running_loop().create_future()
+
+    def _watched(self) -> bool:
+        return (
+            self._streams > 0
+            or time.monotonic() - self._last_poll < POLL_VIEWER_TIMEOUT_SECONDS
+        )
+
+    async def run(self):
+        while True:
+            if not self._watched():
+                self._wake.clear()
+                await self._wake.wait()
+
+            try:
+                await self._check()
+            except Exception:
+                logger.exception("Updating the spectator snapshot failed")
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def _check(self):
+        try:
+            version = await asyncio.to_thread(self.manager.get_version)
+            if version != self.version:
+                self._publish(
+                    await asyncio.to_thread(self.manager.get_spectator_snapshot)
+                )
+        finally:
+            checked = self._checked
+            self._checked = asyncio.get_running_loop().create_future()
+            checked.set_result(None)
+
+    def _publish(self, snapshot):
+        data = snapshot.model_dump_json()
+        self.version = snapshot.version
+        self.snapshot = data.encode()
+        self.event = f"id: {snapshot.version}\ndata: {data}\n\n".encode()
+        metrics.spectator_snapshots.inc()
+
+        published = self._published
+        self._published = asyncio.get_running_loop().create_future()
+        published.set_result(None)
+
+    async def latest(self) -> tuple[int, bytes]:
+        """The current version and snapshot, for spectators which poll."""
+        stale = not self._watched() or self.version is None
+        self._last_poll = time.monotonic()
+        if stale:
+            self._wake.set()
+            await asyncio.shield(self._checked)
+
+        return self.version, self.snapshot
+
+    async def subscribe(self) -> AsyncGenerator[bytes, None]:
+        """Server-sent events with every new snapshot."""
+        self._streams += 1
+        self._wake.set()
+        try:
+            if self.version is None:
+                await asyncio.shield(self._checked)
+
+            version = None
+            while True:
+                if self.version is not None and self.version != version:
+                    version = self.version
+                    yield self.event
+
+                try:
+                    await asyncio.wait_for(
+                        asyncio.shield(self._published), KEEPALIVE_INTERVAL_SECONDS
+                    )
+                except TimeoutError:
+                    yield KEEPALIVE
+        finally:
+            self._streams -= 1
@@ -1,8 +1,9 @@
 import pathlib
 import functools
+from typing import Literal
 
 import bcrypt
-from pydantic import model_validator
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings
 
 
@@ -15,12 +16,75 @@ class Settings(BaseSettings):
     user_database_string: str
     user_database: dict[str, bytes] | None = None
 
+    admin_users: set[str] = set()
+
     jwt_secret_key: str  # Created with `openssl rand -hex 32`.
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
 
     datatbase_directory: pathlib.Path = pathlib.Path(".")
 
+    # "memory" keeps the whole game in memory, for throwaway games and tests.
+    # If `memory_snapshot_path` is set, it is loaded from there on startup and
+    # written there on shutdown.
+    storage: Literal["disk", "memory"] = "disk"
+    memory_snapshot_path: pathlib.Path | None = None
+
+    # Players without a heartbeat (e.g. polling `/state`) for this long are
+    # idle and no longer hold up the round.
+    presence_timeout_seconds: float = 60
+
+    # Rounds advance after these durations, even if not all players are done.
+    submission_deadline_seconds: float | None = None
+    voting_deadline_seconds: float | None = None
+
+    # Commit writes of concurrent requests together, up to this many at once,
+    # instead of committing every request on its own.
+    write_queue_max_batch: int | None = Field(default=None, ge=1)
+
+    # Metadata of movies players are typing is fetched ahead of their
+    # submission, by at most this many fetches at once.
+    prefetch_max_concurrency: int = Field(default=2, ge=1)
+    # Prefetched movies are kept in memory until submitted, up to this many.
+    prefetch_cache_size: int = Field(default=256, ge=1)
+
+    # How often the game is checked for changes while spectators are watching.
+    spectator_poll_interval_seconds: float = 0.5
+
+    # Requests per second and burst size allowed per client, unlimited if unset.
+    rate_limit_per_second: float | None = Field(default=None, gt=0)
+    rate_limit_burst: int = Field(default=20, ge=1)
+
+    # Requests beyond this many at once are shed, reads already once this
+    # fraction of them is taken, so that writes still get through.
+    max_inflight_requests: int | None = Field(default=None, ge=1)
+    shed_reads_fraction: float = Field(default=0.5, gt=0, le=1)
+
+    # Database maintenance runs once the game stayed in the overview for
+    # `maintenance_idle_seconds`, at most every `maintenance_interval_seconds`.
+    # The slower integrity checks run at most every
+    # `maintenance_integrity_check_interval_seconds`.
+    maintenance_interval_seconds: float | None = 24 * 60 * 60
+    maintenance_idle_seconds: float = 5 * 60
+    maintenance_integrity_check_interval_seconds: float | None = 7 * 24 * 60 * 60
+
+    # Clients further behind than this many changes reload the whole round.
+    round_delta_max_events: int = 500
+
+    # Keep only this many recent rounds in the database, older rounds are
+    # moved to compressed archive files holding `archive_season_rounds` each.
+    archive_keep_rounds: int | None = Field(default=None, ge=1)
+    archive_season_rounds: int = Field(default=50, ge=1)
+
+    # Snapshot the game state every this many events in the event log.
+    event_snapshot_interval: int = 100
+
+    idempotency_max_entries: int = 10_000
+    idempotency_ttl_seconds: float = 24 * 60 * 60
+
+    # Log requests slower than this, including their SQL statements.
+    slow_request_log_threshold_ms: float | None = None
+
     @model_validator(mode="after")
     def check_passwords_match(self) -> "Settings":
         if self.user_database is not None:
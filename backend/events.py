@@ -0,0 +1,94 @@
+import dataclasses
+
+from sqlmodel import Session, select
+
+from . import models
+
+
+PLAYER_JOINED = "player_joined"
+ROUND_CREATED = "round_created"
+SUBMISSION_ADDED = "submission_added"
+VOTE_CAST = "vote_cast"
+COMMENTS_ADDED = "comments_added"
+STATE_TRANSITION = "state_transition"
+
+# Events which change the data of a round.
+ROUND_EVENTS = (ROUND_CREATED, SUBMISSION_ADDED, VOTE_CAST, COMMENTS_ADDED)
+
+
+@dataclasses.dataclass
+class Projection:
+    """Game state which is rebuilt from the event log."""
+
+    state: str | None = None
+    round_id: int | None = None
+    event_id: int = 0
+    snapshot_event_id: int = 0
+
+
+def append(session: Session, type: str, **payload) -> models.GameEvent:
+    event = models.GameEvent(type=type, payload=payload)
+    session.add(event)
+    return event
+
+
+def apply(projection: Projection, event: models.GameEvent) -> Projection:
+    if event.type == STATE_TRANSITION:
+        projection.state = event.payload["state"]
+    elif event.type == ROUND_CREATED:
+        projection.round_id = event.payload["round_id"]
+
+    projection.event_id = event.id
+    return projection
+
+
+def snapshot(session: Session, projection: Projection) -> models.GameStateSnapshot:
+    db_snapshot = models.GameStateSnapshot(
+        event_id=projection.event_id,
+        state=projection.state,
+        round_id=projection.round_id,
+    )
+    session.add(db_snapshot)
+    projection.snapshot_event_id = projection.event_id
+    return db_snapshot
+
+
+def replay(session: Session) -> Projection:
+    """Load the latest snapshot and apply all events after it."""
+    db_snapshot = session.exec(
+        select(models.GameStateSnapshot)
+        .order_by(models.GameStateSnapshot.id.desc())
+        .limit(1)
+    ).first()
+
+    projection = Projection()
+    if db_snapshot is not None:
+        projection = Projection(
+            state=db_snapshot.state,
+            round_id=db_snapshot.round_id,
+            event_id=db_snapshot.event_id,
+            snapshot_event_id=db_snapshot.event_id,
+        )
+
+    for event in session.exec(
+        select(models.GameEvent)
+        .where(models.GameEvent.id > projection.event_id)
+        .order_by(models.GameEvent.id)
+    ):
+        apply(projection, event)
+
+    return projection
+
+
+def events_since(
+    session: Session, after: int, limit: int
+) -> list[models.GameEventPublic]:
+    return [
+        models.GameEventPublic.model_validate(event)
+        for event in session.exec(
+            select(models.GameEvent)
+            .where(models.GameEvent.id > after)
+            .order_by(models.GameEvent.id)
+            .limit(limit)
+        )
+    ]
@@ -0,0 +1,119 @@
+"""Serving of the built frontend.
+
+Build it and precompress the assets before starting the backend:
+
+    $ npm run build
+    $ uv run python -m backend.frontend compress
+"""
+
+import argparse
+import gzip
+import mimetypes
+import os
+import pathlib
+
+from fastapi import APIRouter, Request
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # Optional, assets are only gzipped without it.
+    brotli = None
+
+
+FRONTEND_DIRECTORY = pathlib.Path(__file__).parent.parent / "frontend" / "dist"
+
+# Vite puts content hashes into asset file names, so they never change.
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".css", ".svg", ".json", ".txt", ".map"}
+
+
+def _accepted_encodings(scope: Scope) -> set[str]:
+    accepted = set()
+    for value in Headers(scope=scope).get("accept-encoding", "").split(","):
+        encoding, *params = (part.strip() for part in value.split(";"))
+        if "q=0" not in params and "q=0.0" not in params:
+            accepted.add(encoding.lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """Serves `<file>.br` or `<file>.gz` instead of a file if the client accepts it."""
+
+    def __init__(self, *, cache_control: str, **kwargs):
+        super().__init__(**kwargs)
+        self.cache_control = cache_control
+
+    def file_response(
+        self,
+        full_path: os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        headers = {"Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+
+        accepted = _accepted_encodings(scope)
+        for encoding, suffix in ENCODINGS:
+            compressed_path = f"{full_path}{suffix}"
+            if encoding in accepted and os.path.isfile(compressed_path):
+                full_path, stat_result = compressed_path, os.stat(compressed_path)
+                headers["Content-Encoding"] = encoding
+                break
+
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+# Only `/` and `/assets` are taken, so the API keeps all other paths.
+assets = PrecompressedStaticFiles(
+    directory=FRONTEND_DIRECTORY / "assets", check_dir=False, cache_control=IMMUTABLE
+)
+_index = PrecompressedStaticFiles(
+    directory=FRONTEND_DIRECTORY, check_dir=False, cache_control="no-cache"
+)
+
+router = APIRouter()
+
+
+@router.get("/", include_in_schema=False)
+async def get_index(request: Request) -> Response:
+    return await _index.get_response("index.html", request.scope)
+
+
+def compress(directory: pathlib.Path):
+    for path in directory.rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+
+        data = path.read_bytes()
+        path.with_name(f"{path.name}.gz").write_bytes(
+            gzip.compress(data, compresslevel=9, mtime=0)
+        )
+        if brotli is not None:
+            path.with_name(f"{path.name}.br").write_bytes(
+                brotli.compress(data, quality=11)
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare the built frontend.")
+    parser.add_argument("command", choices=["compress"])
+    parser.add_argument("--directory", type=pathlib.Path, default=FRONTEND_DIRECTORY)
+    args = parser.parse_args()
+
+    compress(args.directory)
@@ -1,19 +1,73 @@
 import abc
 import contextlib
-from typing import Generator
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from typing import Generator, TypeVar
 
 from fastapi import HTTPException, status
-from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import (
+    Session,
+    SQLModel,
+    and_,
+    create_engine,
+    delete,
+    func,
+    or_,
+    select,
+)
+
+from . import (
+    archive,
+    events,
+    maintenance,
+    prefetch,
+    metrics,
+    models,
+    search,
+    singleflight,
+    stats,
+    write_queue,
+)
+from .config import Settings
 
-import imdbmovies
 
-from . import models
-from .config import Settings
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Stored as `PRAGMA user_version`, bump it when the schema changes.
+SCHEMA_VERSION = 3
+
+# Shorter titles are likely still being typed and not worth a prefetch.
+PREFETCH_MIN_LENGTH = 3
+
+
+def normalize_title(name: str) -> str:
+    return " ".join(name.split()).casefold()
 
 
 class GameState(abc.ABC):
+    deadline_setting: str | None = None
+
     def __init__(self, manager: "GameManager"):
         self.manager = manager
+        self.entered_at = time.monotonic()
+
+        # Monotonic time at which the state ends even if players are not done.
+        seconds = (
+            getattr(manager._settings, self.deadline_setting)
+            if self.deadline_setting
+            else None
+        )
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
 
     @abc.abstractmethod
     def enter(self):
@@ -27,10 +81,13 @@ class GameState(abc.ABC):
     def update(self):
         pass
 
+    def on_deadline(self):
+        pass
+
 
 class OverviewState(GameState):
     def enter(self):
-        pass
+        self.manager.archive_rounds()
 
     def exit(self):
         pass
@@ -40,18 +97,30 @@ class OverviewState(GameState):
 
 
 class VotingState(GameState):
+    deadline_setting = "voting_deadline_seconds"
+
+    def __init__(self, manager: "GameManager"):
+        super().__init__(manager)
+        # A new round can be created during voting, remember the voted one.
+        self.round_id = manager.latest_round_id()
+
     def enter(self):
         pass
 
     def exit(self):
-        pass
+        self.manager.record_round_stats(self.round_id)
 
     def update(self):
         if self.manager.all_players_voted():
             self.manager.transition_to_state(OverviewState)
 
+    def on_deadline(self):
+        self.manager.transition_to_state(OverviewState)
+
 
 class SubmissionState(GameState):
+    deadline_setting = "submission_deadline_seconds"
+
     def enter(self):
         pass
 
@@ -62,6 +131,18 @@ class SubmissionState(GameState):
         if self.manager.all_players_submitted():
             self.manager.transition_to_state(VotingState)
 
+    def on_deadline(self):
+        # There is nothing to vote on without submissions.
+        if self.manager.get_current_round().submissions:
+            self.manager.transition_to_state(VotingState)
+        else:
+            self.manager.transition_to_state(OverviewState)
+
+
+GAME_STATES = {
+    state.__name__: state for state in (OverviewState, VotingState, SubmissionState)
+}
+
 
 class GameManager:
     def __init__(self, settings: Settings, initial_state: GameState | None = None):
@@ -69,9 +150,149 @@ class GameManager:
         self._state = (initial_state or OverviewState)(self)
 
         self.engine = None
+        self.round_archive = None
+
+        # Requests are handled concurrently, but each transition must happen once.
+        self._state_lock = threading.RLock()
+
+        # Players submitting the same new movie at once share one fetch.
+        self._movie_fetches = singleflight.SingleFlight()
+        self._prefetcher = prefetch.Prefetcher(settings.prefetch_max_concurrency)
+        # Prefetched metadata, by normalized title, only stored once submitted.
+        self._prefetched = prefetch.LRUCache(settings.prefetch_cache_size)
+        self._metadata_fetches = singleflight.SingleFlight()
+
+        self._write_queue: write_queue.WriteQueue | None = None
+        self._memory_database: sqlite3.Connection | None = None
+
+        # Monotonic times of the last database maintenance and integrity check.
+        self._last_maintenance = -float("inf")
+        self._last_integrity_check = -float("inf")
+        self.last_maintenance_report: models.MaintenanceReport | None = None
+
+        self._projection = events.Projection()
+
+        # Last heartbeat of every player, in monotonic time.
+        self._last_seen: dict[str, float] = {}
+        self._last_seen_lock = threading.Lock()
+        self.scheduler = None
 
     def update(self):
-        self._state.update()
+        with self._state_lock:
+            self._state.update()
+
+    def heartbeat(self, username: str):
+        cutoff = time.monotonic() - self._settings.presence_timeout_seconds
+        with self._last_seen_lock:
+            was_active = self._last_seen.get(username, cutoff) > cutoff
+            self._last_seen[username] = time.monotonic()
+
+        # A newly active player can go idle, which needs to be scheduled.
+        if not was_active and self.scheduler is not None:
+            self.scheduler.notify()
+
+    def active_players(self) -> set[str]:
+        cutoff = time.monotonic() - self._settings.presence_timeout_seconds
+        with self._last_seen_lock:
+            last_seen = list(self._last_seen.items())
+        return {username for username, seen in last_seen if seen > cutoff}
+
+    def next_wakeup(self) -> float | None:
+        """Monotonic time at which a deadline passes or a player goes idle."""
+        now = time.monotonic()
+        timeout = self._settings.presence_timeout_seconds
+
+        with self._last_seen_lock:
+            wakeups = [seen + timeout for seen in self._last_seen.values()]
+        if self._state.deadline is not None:
+            wakeups.append(self._state.deadline)
+        wakeups = [wakeup for wakeup in wakeups if wakeup > now]
+
+        # Overdue maintenance is still pending, unlike passed deadlines.
+        maintenance_due = self.maintenance_due()
+        if maintenance_due is not None:
+            wakeups.append(max(maintenance_due, now))
+
+        return min(wakeups, default=None)
+
+    def check_deadline(self):
+        with self._state_lock:
+            deadline = self._state.deadline
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.info("Deadline of %s passed", self._state.__class__.__name__)
+                self._state.on_deadline()
+            else:
+                # Idle players might have been the only ones holding up the round.
+                self._state.update()
+
+            # Holding the state lock, no round starts during maintenance.
+            maintenance_due = self.maintenance_due()
+            if maintenance_due is not None and time.monotonic() >= maintenance_due:
+                self.run_maintenance()
+
+    def maintenance_due(self) -> float | None:
+        """Monotonic time at which database maintenance is due, if at all.
+
+        It only runs in the overview, once nobody started a new round for a while.
+        """
+        interval = self._settings.maintenance_interval_seconds
+        if interval is None or not isinstance(self._state, OverviewState):
+            return None
+
+        return max(
+            self._state.entered_at + self._settings.maintenance_idle_seconds,
+            self._last_maintenance + interval,
+        )
+
+    def run_maintenance(self) -> models.MaintenanceReport:
+        """Run database maintenance right away, holding off any new round.
+
+        Like scheduled maintenance, it only runs in the overview.
+        """
+        now = time.monotonic()
+        integrity_interval = self._settings.maintenance_integrity_check_interval_seconds
+        integrity_check = (
+            integrity_interval is not None
+            and now - self._last_integrity_check >= integrity_interval
+        )
+
+        with self._state_lock:
+            if not isinstance(self._state, OverviewState):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Maintenance only runs while no round is being played.",
+                )
+
+            connection = self.engine.raw_connection()
+            try:
+                report = maintenance.run(connection.driver_connection, integrity_check)
+            except Exception:
+                metrics.maintenance_runs.inc(result="error")
+                raise
+            finally:
+                connection.close()
+                # Failures are retried with the next run, not right away.
+                self._last_maintenance = now
+                if integrity_check:
+                    self._last_integrity_check = now
+
+        metrics.maintenance_runs.inc(result="ok")
+        metrics.maintenance_reclaimed_bytes.inc(report.reclaimed_bytes)
+        metrics.maintenance_duration.observe(report.duration_seconds)
+        self.last_maintenance_report = report
+
+        logger.info(
+            "Database maintenance took %.1f ms, reclaimed %d bytes (%d bytes free), "
+            "integrity: %s",
+            report.duration_seconds * 1000,
+            report.reclaimed_bytes,
+            report.free_bytes,
+            report.integrity or "not checked",
+        )
+        if report.integrity not in (None, "ok"):
+            logger.error("Database integrity check failed: %s", report.integrity)
+
+        return report
 
     def is_in_state(self, state: GameState) -> bool:
         return isinstance(self._state, state)
@@ -81,35 +302,193 @@ class GameManager:
             with self.sql_session() as session:
                 db_user = models.User.model_validate(user)
                 session.add(db_user)
+                session.flush()
+
+                events.append(
+                    session, events.PLAYER_JOINED, user_id=db_user.id, name=db_user.name
+                )
                 session.commit()
                 session.refresh(db_user)
 
+        self.heartbeat(user.name)
+
     @property
     def _players(self):
         with self.sql_session() as session:
             return [user.name for user in session.exec(select(models.User))]
 
     def create_new_round(self, round: models.RoundCreate):
-        with self.sql_session() as session:
-            db_round = models.Round.model_validate(round)
-            session.add(db_round)
-            session.commit()
-            session.refresh(db_round)
+        # Taken before the insert, so that no round starts during maintenance.
+        with self._state_lock:
+            with self.sql_session() as session:
+                db_round = models.Round.model_validate(round)
+                session.add(db_round)
+                session.flush()
+
+                events.append(
+                    session,
+                    events.ROUND_CREATED,
+                    round_id=db_round.id,
+                    prompt=db_round.prompt,
+                )
+                session.commit()
+                session.refresh(db_round)
 
-        self.transition_to_state(SubmissionState)
+            self.transition_to_state(SubmissionState)
 
-    def get_all_rounds(self) -> list[models.Round]:
+    def get_all_rounds(
+        self, offset: int = 0, limit: int | None = None
+    ) -> list[models.RoundWithResults]:
         with self.sql_session() as session:
-            return session.exec(
-                select(models.Round).order_by(models.Round.id.desc())
-            ).all()
+            return self._history(session, offset, limit)
+
+    def _history(
+        self, session: Session, offset: int, limit: int | None
+    ) -> list[models.RoundWithResults]:
+        # Both parts were built from trusted data, no need to validate them again.
+        def with_results(round, results):
+            return models.RoundWithResults.model_construct(
+                **dict(round), results=results
+            )
+
+        rounds = [
+            with_results(
+                models.from_row(models.RoundPublicWithSubmissions, round),
+                self._round_results(session, round),
+            )
+            for round in session.exec(
+                select(models.Round)
+                .order_by(models.Round.id.desc())
+                .offset(offset)
+                .limit(limit)
+            )
+        ]
+        if limit is not None and len(rounds) >= limit:
+            return rounds
+
+        # Older rounds are read through from the archive.
+        hot_rounds = session.exec(select(func.count(models.Round.id))).one()
+        rounds.extend(
+            with_results(entry.round, entry.results)
+            for entry in self.round_archive.get_rounds(
+                max(offset - hot_rounds, 0),
+                None if limit is None else limit - len(rounds),
+            )
+        )
+        return rounds
 
     def get_current_round(self) -> models.RoundPublicWithSubmissions:
         with self.sql_session() as session:
-            return models.RoundPublicWithSubmissions.model_validate(
-                session.exec(
-                    select(models.Round).order_by(models.Round.id.desc()).limit(1)
-                ).first()
+            db_round = session.exec(
+                select(models.Round).order_by(models.Round.id.desc()).limit(1)
+            ).first()
+            return models.from_row(models.RoundPublicWithSubmissions, db_round)
+
+    def get_round_delta(self, since: int) -> models.RoundDelta:
+        with self.sql_session() as session:
+            # Read everything within one transaction so that all parts agree.
+            session.connection().exec_driver_sql("BEGIN")
+
+            version = session.exec(select(func.max(models.GameEvent.id))).one() or 0
+            db_round = session.exec(
+                select(models.Round).order_by(models.Round.id.desc()).limit(1)
+            ).first()
+
+            max_events = self._settings.round_delta_max_events
+            new_events = session.exec(
+                select(models.GameEvent)
+                .where(
+                    models.GameEvent.id > since,
+                    models.GameEvent.type.in_(events.ROUND_EVENTS),
+                )
+                .order_by(models.GameEvent.id)
+                .limit(max_events + 1)
+            ).all()
+
+            # Clients which are new, too far behind or still on an older
+            # round get the full round instead.
+            if (
+                db_round is None
+                or since <= 0
+                or since > version
+                or len(new_events) > max_events
+                or any(event.type == events.ROUND_CREATED for event in new_events)
+            ):
+                return models.RoundDelta(
+                    version=version,
+                    round=(
+                        models.from_row(models.RoundPublicWithSubmissions, db_round)
+                        if db_round
+                        else None
+                    ),
+                )
+
+            # New submissions are sent in full, including their votes and comments.
+            new_submission_ids = {
+                event.payload["submission_id"]
+                for event in new_events
+                if event.type == events.SUBMISSION_ADDED
+            }
+            changed_submission_ids = {
+                submission.id for submission in db_round.submissions
+            } - new_submission_ids
+
+            users = {
+                user.id: models.from_row(models.UserPublic, user)
+                for user in session.exec(
+                    select(models.User).where(
+                        models.User.id.in_(
+                            {event.payload["user_id"] for event in new_events}
+                        )
+                    )
+                )
+            }
+
+            votes = []
+            comments = []
+            for event in new_events:
+                user = users[event.payload["user_id"]]
+
+                if event.type == events.VOTE_CAST:
+                    if event.payload["submission_id"] in changed_submission_ids:
+                        votes.append(
+                            models.VotePublic(
+                                submission_id=event.payload["submission_id"],
+                                user=user,
+                            )
+                        )
+                    event_comments = [
+                        (int(submission_id), text)
+                        for submission_id, text in event.payload["comments"].items()
+                    ]
+                elif event.type == events.COMMENTS_ADDED:
+                    event_comments = [
+                        (comment["submission_id"], comment["text"])
+                        for comment in event.payload["comments"]
+                    ]
+                else:
+                    continue
+
+                comments.extend(
+                    models.CommentPublic(
+                        submission_id=submission_id,
+                        author_id=user.id,
+                        text=text,
+                        author=user,
+                    )
+                    for submission_id, text in event_comments
+                    if submission_id in changed_submission_ids
+                )
+
+            return models.RoundDelta(
+                version=version,
+                submissions=[
+                    models.from_row(models.SubmissionPublic, submission)
+                    for submission in db_round.submissions
+                    if submission.id in new_submission_ids
+                ],
+                votes=votes,
+                comments=comments,
             )
 
     def add_submission(
@@ -136,16 +515,27 @@ class GameManager:
                     detail=f"User '{username}' not found.",
                 )
 
-            # Get or create movie.
-            movie = session.exec(
-                select(models.Movie).where(models.Movie.name == submission.name)
-            ).first()
+            # A prefetch still waiting is of no use anymore.
+            self._prefetcher.cancel(username)
 
-            if not movie:
-                movie = self.load_movie_object(submission.name)
-                session.add(movie)
-                session.commit()
-                session.refresh(movie)
+            # Get or create movie.
+            movie = self._find_movie(session, submission.name)
+
+            if movie:
+                metrics.movie_cache_requests.inc(result="hit")
+            else:
+                (movie_id, prefetched), shared = self._movie_fetches.do(
+                    normalize_title(submission.name),
+                    lambda: self._create_movie(submission.name),
+                )
+                metrics.movie_cache_requests.inc(
+                    result=(
+                        "coalesced"
+                        if shared
+                        else "prefetched" if prefetched else "miss"
+                    )
+                )
+                movie = session.get(models.Movie, movie_id)
 
             # Create the new submission
             new_submission = models.Submission(
@@ -156,8 +546,7 @@ class GameManager:
 
             # Update database.
             session.add(new_submission)
-            session.commit()
-            session.refresh(new_submission)
+            session.flush()
 
             # Add comment if given.
             if submission.comment is not None:
@@ -167,64 +556,178 @@ class GameManager:
                     text=submission.comment,
                 )
                 session.add(comment)
-                session.commit()
-                session.refresh(comment)
 
-            return models.SubmissionPublic.model_validate(new_submission)
+            events.append(
+                session,
+                events.SUBMISSION_ADDED,
+                submission_id=new_submission.id,
+                round_id=round.id,
+                user_id=user.id,
+                movie_id=movie.id,
+                comment=submission.comment,
+            )
+            session.commit()
+            session.refresh(new_submission)
+
+            return models.from_row(models.SubmissionPublic, new_submission)
 
-    def add_vote(self, username: str, vote: models.VoteCreate):
+    def prefetch_movie(self, username: str, name: str):
+        """Fetch the metadata of a movie the player is likely to submit.
+
+        It is kept in memory until submitted, so that titles which were only
+        typed along the way do not end up in the database.
+        """
+        if len(normalize_title(name)) < PREFETCH_MIN_LENGTH:
+            return
+        self._prefetcher.submit(username, lambda: self._prefetch_movie(name))
+
+    def _prefetch_movie(self, name: str):
+        # The round might have moved on while the prefetch was waiting.
+        if not self.is_in_state(SubmissionState):
+            return
+
+        key = normalize_title(name)
+        if key in self._prefetched:
+            return
         with self.sql_session() as session:
-            # Get voting user.
-            user = session.exec(
-                select(models.User).where(models.User.name == username)
-            ).first()
+            if self._find_movie(session, name) is not None:
+                return
 
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"User '{username}' not found.",
-                )
+        self._prefetched.put(key, self._fetch_metadata(name))
+
+    def _fetch_metadata(self, name: str) -> models.Movie:
+        # Submitting during a prefetch of the same title shares its fetch.
+        movie, _ = self._metadata_fetches.do(
+            normalize_title(name), lambda: self.load_movie_object(name)
+        )
+        return movie
 
-            # Assign vote.
-            user.voted_submissions.append(
-                session.get(models.Submission, vote.submission_id)
+    def _find_movie(self, session: Session, name: str) -> models.Movie | None:
+        return session.exec(
+            select(models.Movie).where(
+                or_(models.Movie.name == name, models.Movie.requested_name == name)
             )
+        ).first()
+
+    def _create_movie(self, name: str) -> tuple[int, bool]:
+        """Id of the stored movie, and whether its metadata was prefetched."""
+        metadata = self._prefetched.pop(normalize_title(name))
+        prefetched = metadata is not None
+        if not prefetched:
+            metadata = self._fetch_metadata(name)
+
+        # Fetches are shared, so every caller stores a copy of its own.
+        movie = models.Movie(
+            **{**metadata.model_dump(exclude={"id"}), "requested_name": name}
+        )
 
-            # Assign comments.
-            for submission_id, comment_text in vote.all_comments.items():
-                comment = models.Comment(
-                    submission_id=submission_id,
-                    author_id=user.id,
-                    text=comment_text,
-                )
-                session.add(comment)
+        with self.sql_session() as session:
+            # Different titles can resolve to the same movie.
+            movie_id = session.exec(
+                select(models.Movie.id).where(models.Movie.name == movie.name)
+            ).first()
+            if movie_id is not None:
+                return movie_id, prefetched
+
+            session.add(movie)
+            try:
                 session.commit()
-                session.refresh(comment)
+            except IntegrityError:
+                # Inserted concurrently, e.g. by another process.
+                session.rollback()
+                movie_id = session.exec(
+                    select(models.Movie.id).where(models.Movie.name == movie.name)
+                ).one()
+                return movie_id, prefetched
 
-            # Update database.
-            session.add(user)
-            session.commit()
-            session.refresh(user)
+            return movie.id, prefetched
 
-    def add_comment(self, username: str, comment: models.CommentCreate):
-        with self.sql_session() as session:
-            # Get commenting user.
-            user = session.exec(
-                select(models.User).where(models.User.name == username)
-            ).first()
+    def add_vote(self, username: str, vote: models.VoteCreate):
+        self._write(lambda session: self._add_vote(session, username, vote))
+
+    def _add_vote(self, session: Session, username: str, vote: models.VoteCreate):
+        # Get voting user.
+        user = session.exec(
+            select(models.User).where(models.User.name == username)
+        ).first()
+
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"User '{username}' not found.",
+            )
 
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"User '{username}' not found.",
-                )
+        # Get voted submission.
+        submission = session.get(models.Submission, vote.submission_id)
+
+        if not submission:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Submission '{vote.submission_id}' not found.",
+            )
 
-            comment.author_id = user.id
+        # Assign vote.
+        user.voted_submissions.append(submission)
+        submission.vote_count = models.Submission.vote_count + 1
 
-            db_comment = models.Comment.model_validate(comment)
-            session.add(db_comment)
-            session.commit()
-            session.refresh(db_comment)
+        # Assign comments.
+        session.add_all(
+            models.Comment(
+                submission_id=submission_id,
+                author_id=user.id,
+                text=comment_text,
+            )
+            for submission_id, comment_text in vote.all_comments.items()
+        )
+
+        events.append(
+            session,
+            events.VOTE_CAST,
+            submission_id=submission.id,
+            user_id=user.id,
+            comments={
+                str(submission_id): comment_text
+                for submission_id, comment_text in vote.all_comments.items()
+            },
+        )
+
+        # Update database in a single transaction.
+        session.add(user)
+
+    def add_comment(self, username: str, comment: models.CommentCreate):
+        self.add_comments(username, [comment])
+
+    def add_comments(self, username: str, comments: list[models.CommentCreate]):
+        self._write(lambda session: self._add_comments(session, username, comments))
+
+    def _add_comments(
+        self, session: Session, username: str, comments: list[models.CommentCreate]
+    ):
+        # Get commenting user.
+        user = session.exec(
+            select(models.User).where(models.User.name == username)
+        ).first()
+
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"User '{username}' not found.",
+            )
+
+        session.add_all(
+            models.Comment.model_validate(comment, update={"author_id": user.id})
+            for comment in comments
+        )
+
+        events.append(
+            session,
+            events.COMMENTS_ADDED,
+            user_id=user.id,
+            comments=[
+                {"submission_id": comment.submission_id, "text": comment.text}
+                for comment in comments
+            ],
+        )
 
     def all_players_submitted(self) -> bool:
         with self.sql_session() as session:
@@ -239,7 +742,8 @@ class GameManager:
                 )
             )
 
-        return set(self._players) <= users
+        active_players = self.active_players() & set(self._players)
+        return bool(active_players) and active_players <= users
 
     def user_has_submitted(self, username: str) -> bool:
         with self.sql_session() as session:
@@ -254,28 +758,310 @@ class GameManager:
                 )
             )
 
+    def _voting_users(self) -> set[str]:
+        with self.sql_session() as session:
+            current_round_id = select(func.max(models.Round.id)).scalar_subquery()
+
+            return set(
+                session.exec(
+                    select(models.User.name)
+                    .join(
+                        models.UserSubmissionLink,
+                        models.UserSubmissionLink.user_id == models.User.id,
+                    )
+                    .join(
+                        models.Submission,
+                        models.Submission.id == models.UserSubmissionLink.submission_id,
+                    )
+                    .where(models.Submission.round_id == current_round_id)
+                    .distinct()
+                )
+            )
+
     def all_players_voted(self) -> bool:
-        round = self.get_current_round()
+        active_players = self.active_players() & set(self._players)
+        return bool(active_players) and active_players <= self._voting_users()
+
+    def user_has_voted(self, username: str) -> bool:
+        return username in self._voting_users()
+
+    def get_round_results(self, round_id: int | None = None) -> models.RoundResults:
+        with self.sql_session() as session:
+            if round_id is None:
+                round = session.exec(
+                    select(models.Round).order_by(models.Round.id.desc()).limit(1)
+                ).first()
+            else:
+                round = session.get(models.Round, round_id)
+
+            if not round:
+                archived = (
+                    self.round_archive.get_round(round_id)
+                    if round_id is not None
+                    else None
+                )
+                if archived is not None:
+                    return archived.results
 
-        voting_users = set(
-            user.name
-            for submission in round.submissions
-            for user in submission.voting_users
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Round not found.",
+                )
+
+            return self._round_results(session, round)
+
+    def _round_results(
+        self, session: Session, round: models.Round
+    ) -> models.RoundResults:
+        # Per-submission vote counts, read from the denormalized counters.
+        submissions = [
+            models.SubmissionResult(
+                submission_id=submission_id,
+                movie_id=movie_id,
+                movie_name=movie_name,
+                submitting_user=models.UserPublic(id=user_id, name=user_name),
+                votes=votes,
+            )
+            for submission_id, movie_id, movie_name, user_id, user_name, votes in (
+                session.exec(
+                    select(
+                        models.Submission.id,
+                        models.Movie.id,
+                        models.Movie.name,
+                        models.User.id,
+                        models.User.name,
+                        models.Submission.vote_count,
+                    )
+                    .join(models.Movie, models.Movie.id == models.Submission.movie_id)
+                    .join(
+                        models.User,
+                        models.User.id == models.Submission.submitting_user_id,
+                    )
+                    .where(models.Submission.round_id == round.id)
+                    .order_by(models.Submission.vote_count.desc(), models.Submission.id)
+                )
+            )
+        ]
+
+        top_votes = max((sub.votes for sub in submissions), default=0)
+        winners = [
+            sub.submission_id
+            for sub in submissions
+            if top_votes > 0 and sub.votes == top_votes
+        ]
+
+        # Running scores over all rounds up to and including this one.
+        score = func.coalesce(
+            func.sum(models.Submission.vote_count), 0
+        ) + func.coalesce(func.max(models.ArchivedScore.score), 0)
+        scores = [
+            models.PlayerScore(
+                user=models.UserPublic(id=user_id, name=user_name), score=total
+            )
+            for user_id, user_name, total in session.exec(
+                select(models.User.id, models.User.name, score)
+                .outerjoin(
+                    models.Submission,
+                    and_(
+                        models.Submission.submitting_user_id == models.User.id,
+                        models.Submission.round_id <= round.id,
+                    ),
+                )
+                .outerjoin(
+                    models.ArchivedScore, models.ArchivedScore.user_id == models.User.id
+                )
+                .group_by(models.User.id)
+                .order_by(score.desc(), models.User.id)
+            )
+        ]
+
+        return models.RoundResults(
+            round_id=round.id,
+            prompt=round.prompt,
+            submissions=submissions,
+            winners=winners,
+            scores=scores,
         )
-        return set(self._players) <= voting_users
 
-    def user_has_voted(self, username: str) -> bool:
-        round = self.get_current_round()
+    def latest_round_id(self) -> int | None:
+        with self.sql_session() as session:
+            return session.exec(select(func.max(models.Round.id))).one()
+
+    def open_round_id(self) -> int | None:
+        """Id of the round still being played, whose results are not final."""
+        with self._state_lock:
+            if isinstance(self._state, OverviewState):
+                return None
+            return self.latest_round_id()
+
+    def record_round_stats(self, round_id: int):
+        with self.sql_session() as session:
+            stats.record_round(session, round_id)
+            session.commit()
+
+    def archive_rounds(self):
+        keep_rounds = self._settings.archive_keep_rounds
+        if keep_rounds is None:
+            return
 
-        voting_users = set(
-            user.name
-            for submission in round.submissions
-            for user in submission.voting_users
+        season_rounds = self._settings.archive_season_rounds
+        with self.sql_session() as session:
+            round_ids = session.exec(
+                select(models.Round.id)
+                .order_by(models.Round.id.desc())
+                .offset(keep_rounds)
+            ).all()[::-1]
+
+            # Only complete seasons are archived, so archive files never change.
+            for start in range(0, len(round_ids) - season_rounds + 1, season_rounds):
+                self._archive_season(session, round_ids[start : start + season_rounds])
+
+    def _archive_season(self, session: Session, round_ids: list[int]):
+        rounds = session.exec(
+            select(models.Round)
+            .where(models.Round.id.in_(round_ids))
+            .order_by(models.Round.id)
+        ).all()
+
+        season = self.round_archive.write(
+            [
+                models.ArchivedRound(
+                    round=models.from_row(models.RoundPublicWithSubmissions, round),
+                    results=self._round_results(session, round),
+                )
+                for round in rounds
+            ]
+        )
+
+        # Keep running scores complete once the submissions are gone.
+        for user_id, score in session.exec(
+            select(
+                models.Submission.submitting_user_id,
+                func.sum(models.Submission.vote_count),
+            )
+            .where(models.Submission.round_id.in_(round_ids))
+            .group_by(models.Submission.submitting_user_id)
+        ):
+            archived_score = session.get(models.ArchivedScore, user_id)
+            if archived_score is None:
+                archived_score = models.ArchivedScore(user_id=user_id)
+            archived_score.score += score
+            session.add(archived_score)
+
+        submission_ids = select(models.Submission.id).where(
+            models.Submission.round_id.in_(round_ids)
+        )
+        session.exec(
+            delete(models.Comment).where(
+                models.Comment.submission_id.in_(submission_ids)
+            )
+        )
+        session.exec(
+            delete(models.UserSubmissionLink).where(
+                models.UserSubmissionLink.submission_id.in_(submission_ids)
+            )
+        )
+        session.exec(
+            delete(models.Submission).where(models.Submission.round_id.in_(round_ids))
+        )
+        session.exec(delete(models.Round).where(models.Round.id.in_(round_ids)))
+        session.commit()
+
+        logger.info("Archived rounds %s to %s", round_ids[0], round_ids[-1])
+        return season
+
+    def get_snapshot(
+        self, username: str, history_offset: int = 0, history_limit: int = 10
+    ) -> models.Snapshot:
+        with self.sql_session() as session:
+            # Read everything within one transaction so that all parts agree.
+            session.connection().exec_driver_sql("BEGIN")
+
+            version = session.exec(select(func.max(models.GameEvent.id))).one() or 0
+            rounds = self._history(session, history_offset, history_limit)
+            db_round = session.exec(
+                select(models.Round).order_by(models.Round.id.desc()).limit(1)
+            ).first()
+
+            round = (
+                models.from_row(models.RoundPublicWithSubmissions, db_round)
+                if db_round
+                else None
+            )
+            snapshot = models.Snapshot(
+                version=version,
+                state=self._state_message_for_round(username, round),
+                round=round,
+                results=self._round_results(session, db_round) if db_round else None,
+                rounds=rounds,
+            )
+
+        return snapshot
+
+    def get_version(self) -> int:
+        with self.sql_session() as session:
+            return session.exec(select(func.max(models.GameEvent.id))).one() or 0
+
+    def get_spectator_snapshot(self) -> models.SpectatorSnapshot:
+        with self.sql_session() as session:
+            # Read everything within one transaction so that all parts agree.
+            session.connection().exec_driver_sql("BEGIN")
+
+            version = session.exec(select(func.max(models.GameEvent.id))).one() or 0
+            db_round = session.exec(
+                select(models.Round).order_by(models.Round.id.desc()).limit(1)
+            ).first()
+
+            return models.SpectatorSnapshot(
+                version=version,
+                state=self._base_state_message(),
+                round=(
+                    models.from_row(models.RoundPublicWithSubmissions, db_round)
+                    if db_round
+                    else None
+                ),
+                results=self._round_results(session, db_round) if db_round else None,
+            )
+
+    def _state_message_for_round(
+        self, username: str, round: models.RoundPublicWithSubmissions | None
+    ) -> models.CurrentState:
+        state_message = self._base_state_message()
+        submissions = round.submissions if round else []
+
+        if self.is_in_state(SubmissionState):
+            state_message.player_state = (
+                "closed"
+                if any(sub.submitting_user.name == username for sub in submissions)
+                else "open"
+            )
+        elif self.is_in_state(VotingState):
+            state_message.player_state = (
+                "closed"
+                if any(
+                    user.name == username
+                    for sub in submissions
+                    for user in sub.voting_users
+                )
+                else "open"
+            )
+
+        return state_message
+
+    def _base_state_message(self) -> models.CurrentState:
+        deadline = self._state.deadline
+        return models.CurrentState(
+            state=self._state.__class__.__name__,
+            deadline=(
+                datetime.now(timezone.utc)
+                + timedelta(seconds=deadline - time.monotonic())
+                if deadline is not None
+                else None
+            ),
         )
-        return username in voting_users
 
     def get_current_state_message(self, username) -> models.CurrentState:
-        state_message = models.CurrentState(state=self._state.__class__.__name__)
+        state_message = self._base_state_message()
 
         if self.is_in_state(SubmissionState):
             state_message.player_state = (
@@ -289,17 +1075,60 @@ class GameManager:
         return state_message
 
     def transition_to_state(self, new_state: GameState):
-        print(f"Transitioning to {new_state}")
+        logger.info("Transitioning to %s", new_state.__name__)
+        metrics.state_transitions.inc(state=new_state.__name__)
+
+        with self._state_lock:
+            if self._state is not None:
+                self._state.exit()
+
+            self._state = new_state(self)
+            self._state.enter()
+
+            self._record_transition()
+
+        if self.scheduler is not None:
+            self.scheduler.notify()
+
+    def _record_transition(self):
+        with self.sql_session() as session:
+            event = events.append(
+                session, events.STATE_TRANSITION, state=self._state.__class__.__name__
+            )
+            session.flush()
+            events.apply(self._projection, event)
+
+            # Periodic snapshots keep the replay on startup short.
+            projection = self._projection
+            if (
+                projection.event_id - projection.snapshot_event_id
+                >= self._settings.event_snapshot_interval
+            ):
+                projection.round_id = session.exec(
+                    select(func.max(models.Round.id))
+                ).one()
+                events.snapshot(session, projection)
+
+            session.commit()
+
+    def restore_state(self):
+        with self.sql_session() as session:
+            self._projection = events.replay(session)
 
-        if self._state is not None:
-            self._state.exit()
+        # Resume where the game left off, the state was entered before.
+        if self._projection.state is not None:
+            self._state = GAME_STATES[self._projection.state](self)
 
-        self._state = new_state(self)
-        self._state.enter()
+    def get_events(self, after: int, limit: int) -> list[models.GameEventPublic]:
+        with self.sql_session() as session:
+            return events.events_since(session, after, limit)
 
     def setup_database(self):
-        sqlite_file_name = self._settings.datatbase_directory / "database.db"
-        sqlite_url = f"sqlite:///{sqlite_file_name}"
+        if self._settings.storage == "memory":
+            sqlite_url = self._setup_memory_database()
+        else:
+            sqlite_file_name = self._settings.datatbase_directory / "database.db"
+            sqlite_url = f"sqlite:///{sqlite_file_name}"
 
         connect_args = {"check_same_thread": False}
         self.engine = create_engine(
@@ -308,15 +1137,154 @@ class GameManager:
             pool_size=10,
         )
 
-        SQLModel.metadata.create_all(self.engine)
+        metrics.instrument_engine(self.engine)
+
+        # Only outdated databases need schema changes, keeping startup fast.
+        with self.engine.begin() as connection:
+            version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+            if version < SCHEMA_VERSION:
+                self.migrate_database(connection, version)
+
+        if self._settings.write_queue_max_batch is not None:
+            # A connection of its own, the queue is the only writer using it.
+            writer_engine = create_engine(
+                sqlite_url, connect_args=connect_args, pool_size=1
+            )
+            write_queue.enable_savepoints(writer_engine)
+            metrics.instrument_engine(writer_engine)
+            self._write_queue = write_queue.WriteQueue(
+                writer_engine, max_batch=self._settings.write_queue_max_batch
+            )
+
+        self.round_archive = archive.RoundArchive(
+            self._settings.datatbase_directory / "archive"
+        )
+
+        self.restore_state()
+
+        # Give everybody who played before a restart time to reconnect.
+        now = time.monotonic()
+        self._last_seen = {username: now for username in self._players}
+
+    def _setup_memory_database(self) -> str:
+        # Shared by all connections of this process. It vanishes with the last
+        # connection, so one is kept open until `close`.
+        name = f"/moviehive-{uuid.uuid4().hex}"
+        self._memory_database = sqlite3.connect(
+            f"file:{name}?vfs=memdb", uri=True, check_same_thread=False
+        )
+
+        snapshot_path = self._settings.memory_snapshot_path
+        if snapshot_path is not None and snapshot_path.exists():
+            with contextlib.closing(sqlite3.connect(snapshot_path)) as snapshot:
+                snapshot.backup(self._memory_database)
+            logger.info("Loaded in-memory database from %s", snapshot_path)
+
+        return f"sqlite:///file:{name}?vfs=memdb&uri=true"
+
+    def close(self):
+        self._prefetcher.close()
+
+        if self._write_queue is not None:
+            self._write_queue.close()
+            self._write_queue.engine.dispose()
+            self._write_queue = None
+
+        self.engine.dispose()
+
+        if self._memory_database is not None:
+            snapshot_path = self._settings.memory_snapshot_path
+            if snapshot_path is not None:
+                # Written next to it first, so that a snapshot is never partial.
+                tmp_path = snapshot_path.with_suffix(".tmp")
+                with contextlib.closing(sqlite3.connect(tmp_path)) as snapshot:
+                    self._memory_database.backup(snapshot)
+                os.replace(tmp_path, snapshot_path)
+                logger.info("Saved in-memory database to %s", snapshot_path)
+
+            self._memory_database.close()
+            self._memory_database = None
+
+    def migrate_database(self, connection: Connection, version: int):
+        logger.info("Migrating database from version %s to %s", version, SCHEMA_VERSION)
+
+        SQLModel.metadata.create_all(connection)
+        search.setup(connection)
+
+        # Databases created before versioning can lack the vote counters.
+        if version < 1:
+            columns = {
+                row[1]
+                for row in connection.exec_driver_sql("PRAGMA table_info(submission)")
+            }
+            if "vote_count" not in columns:
+                connection.exec_driver_sql(
+                    "ALTER TABLE submission "
+                    "ADD COLUMN vote_count INTEGER NOT NULL DEFAULT 0"
+                )
+                connection.exec_driver_sql(
+                    "UPDATE submission SET vote_count = ("
+                    "SELECT count(*) FROM usersubmissionlink "
+                    "WHERE usersubmissionlink.submission_id = submission.id)"
+                )
+
+        # Merge duplicate movies before making their names unique.
+        if version < 2:
+            connection.exec_driver_sql(
+                "UPDATE submission SET movie_id = ("
+                "SELECT min(duplicate.id) FROM movie "
+                "JOIN movie AS duplicate ON duplicate.name = movie.name "
+                "WHERE movie.id = submission.movie_id)"
+            )
+            connection.exec_driver_sql(
+                "DELETE FROM movie "
+                "WHERE id NOT IN (SELECT min(id) FROM movie GROUP BY name)"
+            )
+            # Statistics of merged movies are dropped, `stats.rebuild` restores them.
+            connection.exec_driver_sql(
+                "DELETE FROM moviestats WHERE movie_id NOT IN (SELECT id FROM movie)"
+            )
+            connection.exec_driver_sql(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_movie_name ON movie (name)"
+            )
+
+        # Movies which were only prefetched used to be stored, drop them unless
+        # still referenced. Submissions look movies up by requested name, too.
+        if version < 3:
+            connection.exec_driver_sql(
+                "DELETE FROM movie "
+                "WHERE id NOT IN (SELECT movie_id FROM submission) "
+                "AND id NOT IN (SELECT movie_id FROM moviestats)"
+            )
+            connection.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_movie_requested_name "
+                "ON movie (requested_name)"
+            )
+
+        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _write(self, function: Callable[[Session], T]) -> T:
+        if self._write_queue is not None:
+            return self._write_queue.submit(function)
+
+        with self.sql_session() as session:
+            result = function(session)
+            session.commit()
+            return result
 
     @contextlib.contextmanager
     def sql_session(self) -> Generator[Session, None, None]:
-        yield Session(self.engine)
+        # Closing returns the connection to the pool right away instead of
+        # whenever the session gets garbage collected.
+        with Session(self.engine) as session:
+            yield session
 
     def load_movie_object(self, name: str) -> models.Movie:
+        import imdbmovies  # Slow to import, only needed for unknown movies.
+
         imdb = imdbmovies.IMDB()
 
+        start = time.perf_counter()
         movie_data = imdb.get_by_name(name)
 
         actor_data_subset = []
@@ -337,6 +1305,8 @@ class GameManager:
             )
             used_directors.append(director_id)
 
+        metrics.metadata_fetch_duration.observe(time.perf_counter() - start)
+
         return models.Movie(
             name=movie_data["name"],
             requested_name=name,
@@ -0,0 +1,222 @@
+"""Streaming NDJSON export and import of the full game history.
+
+Every line is one record, tagged with its `type`. Records are ordered such
+that everything a record references appears before it, which lets imports
+insert them in a single pass. Archived rounds follow as one `archived_season`
+record per archive file:
+
+    $ uv run python -m backend.history export > history.ndjson
+    $ uv run python -m backend.history import < history.ndjson
+"""
+
+import argparse
+import collections
+import contextlib
+import itertools
+import json
+import sys
+from collections.abc import Callable, Iterable, Iterator
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, func, select
+
+from . import archive, models, stats
+
+
+SessionFactory = Callable[[], contextlib.AbstractContextManager[Session]]
+
+RECORD_TYPES: dict[str, type[SQLModel]] = {
+    "user": models.User,
+    "movie": models.Movie,
+    "round": models.Round,
+    "submission": models.Submission,
+    "vote": models.UserSubmissionLink,
+    "comment": models.Comment,
+    "archived_score": models.ArchivedScore,
+}
+TYPE_NAMES = {model: name for name, model in RECORD_TYPES.items()}
+
+
+def _record(row: SQLModel) -> dict:
+    return {"type": TYPE_NAMES[type(row)], **row.model_dump()}
+
+
+def _batches(
+    sql_session: SessionFactory, model: type[SQLModel], batch_size: int
+) -> Iterator[list[SQLModel]]:
+    # Keyset pagination with a short transaction per batch, so the export
+    # never blocks writers of the live database for long.
+    last_id = 0
+    while True:
+        with sql_session() as session:
+            rows = session.exec(
+                select(model)
+                .where(model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+            ).all()
+
+        if not rows:
+            return
+
+        yield rows
+        last_id = rows[-1].id
+
+
+def export_records(
+    sql_session: SessionFactory,
+    round_archive: archive.RoundArchive,
+    batch_size: int = 1000,
+) -> Iterator[dict]:
+    for model in (models.User, models.Movie, models.Round):
+        for rows in _batches(sql_session, model, batch_size):
+            yield from map(_record, rows)
+
+    # Votes and comments follow the batch of submissions they belong to.
+    for submissions in _batches(sql_session, models.Submission, batch_size):
+        yield from map(_record, submissions)
+
+        submission_ids = [submission.id for submission in submissions]
+        with sql_session() as session:
+            votes = session.exec(
+                select(models.UserSubmissionLink)
+                .where(models.UserSubmissionLink.submission_id.in_(submission_ids))
+                .order_by(
+                    models.UserSubmissionLink.submission_id,
+                    models.UserSubmissionLink.user_id,
+                )
+            ).all()
+            comments = session.exec(
+                select(models.Comment)
+                .where(models.Comment.submission_id.in_(submission_ids))
+                .order_by(models.Comment.id)
+            ).all()
+
+        yield from map(_record, votes)
+        yield from map(_record, comments)
+
+    # There is at most one score per player.
+    with sql_session() as session:
+        archived_scores = session.exec(
+            select(models.ArchivedScore).order_by(models.ArchivedScore.user_id)
+        ).all()
+    yield from map(_record, archived_scores)
+
+    for entries in round_archive.iter_seasons():
+        yield {
+            "type": "archived_season",
+            "rounds": [entry.model_dump(mode="json") for entry in entries],
+        }
+
+
+def to_ndjson(records: Iterable[dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def from_ndjson(lines: Iterable[str | bytes]) -> Iterator[dict]:
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid JSON on line {line_number}: {error}",
+            )
+
+
+def import_records(
+    session: Session,
+    records: Iterable[dict],
+    round_archive: archive.RoundArchive,
+    open_round_id: int | None = None,
+    batch_size: int = 1000,
+) -> dict[str, int]:
+    """Insert exported records into an empty database, in batches.
+
+    Statistics are rebuilt afterwards, leaving out the round still being played.
+    """
+    if (
+        session.exec(select(func.count(models.User.id))).one()
+        or session.exec(select(func.count(models.Round.id))).one()
+        or round_archive.count
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="History can only be imported into an empty database.",
+        )
+
+    counts = collections.Counter()
+
+    # Consecutive records of the same type are inserted with one executemany.
+    for type, group in itertools.groupby(records, key=lambda record: record["type"]):
+        if type == "archived_season":
+            for record in group:
+                round_archive.write(
+                    [
+                        models.ArchivedRound.model_validate(entry)
+                        for entry in record["rounds"]
+                    ]
+                )
+                counts[type] += 1
+            continue
+
+        if type not in RECORD_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown record type '{type}'.",
+            )
+
+        table = RECORD_TYPES[type].__table__
+        while batch := list(itertools.islice(group, batch_size)):
+            session.execute(
+                insert(table),
+                [
+                    {key: value for key, value in row.items() if key != "type"}
+                    for row in batch
+                ],
+            )
+            counts[type] += len(batch)
+
+    session.commit()
+
+    # Summary tables are derived data, so they are recomputed instead.
+    stats.rebuild(session, round_archive, open_round_id)
+
+    return dict(counts)
+
+
+if __name__ == "__main__":
+    from .config import get_settings
+    from .game_manager import GameManager
+
+    parser = argparse.ArgumentParser(description="Export or import the game history.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    manager = GameManager(get_settings())
+    manager.setup_database()
+
+    if args.command == "export":
+        sys.stdout.writelines(
+            to_ndjson(
+                export_records(
+                    manager.sql_session, manager.round_archive, args.batch_size
+                )
+            )
+        )
+    else:
+        with manager.sql_session() as session:
+            counts = import_records(
+                session,
+                from_ndjson(sys.stdin),
+                manager.round_archive,
+                manager.open_round_id(),
+                args.batch_size,
+            )
+        print(counts, file=sys.stderr)
@@ -0,0 +1,136 @@
+import asyncio
+import collections
+import dataclasses
+import hashlib
+import time
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+@dataclasses.dataclass
+class StoredResponse:
+    status_code: int
+    headers: list[tuple[str, str]]
+    body: bytes
+
+    def to_response(self, replayed: bool = True, background=None) -> Response:
+        response = Response(
+            content=self.body, status_code=self.status_code, background=background
+        )
+        # Appended one by one, so that repeated headers like `Set-Cookie` stay.
+        for name, value in self.headers:
+            if name.lower() != "content-length":
+                response.headers.append(name, value)
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+
+@dataclasses.dataclass
+class Entry:
+    fingerprint: str
+    expires_at: float
+    result: asyncio.Future
+
+
+class IdempotencyStore:
+    """Bounded, TTL-expiring store of responses to idempotent write requests.
+
+    Entries are created when a request starts, so concurrent duplicates can
+    await the in-flight result instead of executing the handler again.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: collections.OrderedDict[tuple, Entry] = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+    def get(self, key: tuple) -> Entry | None:
+        self._evict()
+        return self._entries.get(key)
+
+    def start(self, key: tuple, fingerprint: str) -> Entry:
+        entry = Entry(
+            fingerprint=fingerprint,
+            expires_at=time.monotonic() + self.ttl_seconds,
+            result=asyncio.get_running_loop().create_future(),
+        )
+        self._entries[key] = entry
+        self._evict()
+        return entry
+
+    def discard(self, key: tuple, entry: Entry):
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+
+
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None or request.method in SAFE_METHODS:
+            return await call_next(request)
+
+        store: IdempotencyStore = request.app.state.idempotency_store
+
+        # Keys are scoped per client and endpoint.
+        key = (
+            request.headers.get("Authorization"),
+            request.method,
+            request.url.path,
+            idempotency_key,
+        )
+        fingerprint = hashlib.sha256(await request.body()).hexdigest()
+
+        entry = store.get(key)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                detail = f"{IDEMPOTENCY_HEADER} was reused with a different payload."
+                return JSONResponse({"detail": detail}, status_code=422)
+
+            stored = await asyncio.shield(entry.result)
+            return stored.to_response()
+
+        entry = store.start(key, fingerprint)
+        try:
+            response = await call_next(request)
+            body = b"".join([chunk async for chunk in response.body_iterator])
+        except BaseException as exc:
+            store.discard(key, entry)
+            if isinstance(exc, Exception):
+                entry.result.set_exception(exc)
+                entry.result.exception()  # Mark as retrieved if nobody waits.
+            else:
+                entry.result.cancel()
+            raise
+
+        stored = StoredResponse(
+            status_code=response.status_code,
+            headers=list(response.headers.items()),
+            body=body,
+        )
+        entry.result.set_result(stored)
+
+        # Server errors are not remembered so that a retry can succeed.
+        if response.status_code >= 500:
+            store.discard(key, entry)
+
+        # Built like replays, so that the first response does not differ.
+        return stored.to_response(replayed=False, background=response.background)
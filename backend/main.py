@@ -1,10 +1,19 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
 
-from . import game_manager
-from .routes import game, login_system
+from . import (
+    admission,
+    broadcast,
+    frontend,
+    game_manager,
+    idempotency,
+    metrics,
+    scheduler,
+)
+from .routes import admin, game, login_system, search, spectate, stats
+from .routes import metrics as metrics_routes
 from .config import get_settings
 
 
@@ -17,19 +26,62 @@ async def lifespan(app: FastAPI):
     manager.setup_database()
 
     app.state.game_manager = manager
+    app.state.idempotency_store = idempotency.IdempotencyStore(
+        max_entries=settings.idempotency_max_entries,
+        ttl_seconds=settings.idempotency_ttl_seconds,
+    )
+    app.state.admission = (
+        admission.AdmissionController(
+            rate=settings.rate_limit_per_second,
+            burst=settings.rate_limit_burst,
+            max_inflight=settings.max_inflight_requests,
+            read_fraction=settings.shed_reads_fraction,
+            identify=lambda token: login_system.token_username(token, settings),
+        )
+        if settings.rate_limit_per_second is not None
+        or settings.max_inflight_requests is not None
+        else None
+    )
+    app.state.slow_request_threshold = (
+        settings.slow_request_log_threshold_ms / 1000
+        if settings.slow_request_log_threshold_ms is not None
+        else None
+    )
+
+    # Deadlines and idle players advance rounds without any requests.
+    manager.scheduler = scheduler.Scheduler(manager)
+    scheduler_task = asyncio.create_task(manager.scheduler.run())
+
+    # Spectators share one snapshot per game version.
+    app.state.spectators = broadcast.SpectatorBroadcast(
+        manager, poll_interval=settings.spectator_poll_interval_seconds
+    )
+    spectators_task = asyncio.create_task(app.state.spectators.run())
 
     yield
 
+    for task in [scheduler_task, spectators_task]:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+    manager.close()
+
 
 app = FastAPI(lifespan=lifespan)
 
 app.include_router(login_system.router, tags=["login"])
 app.include_router(game.router, tags=["game"])
+app.include_router(stats.router, tags=["stats"])
+app.include_router(search.router, tags=["search"])
+app.include_router(spectate.router, tags=["spectate"])
+app.include_router(metrics_routes.router, tags=["metrics"])
+app.include_router(admin.router, tags=["admin"])
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# The API and the frontend share one origin, so no CORS is needed.
+app.include_router(frontend.router)
+app.mount("/assets", frontend.assets)
+
+app.add_middleware(idempotency.IdempotencyMiddleware)
+app.add_middleware(admission.AdmissionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
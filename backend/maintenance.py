@@ -0,0 +1,64 @@
+"""Upkeep of the SQLite database, run while nobody is playing.
+
+Reclaims free pages, refreshes the statistics of the query planner, truncates
+the write-ahead log if there is one and optionally checks the integrity.
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from . import models
+
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def run(
+    connection: sqlite3.Connection, integrity_check: bool
+) -> models.MaintenanceReport:
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+
+    # VACUUM can not run within a transaction.
+    if connection.in_transaction:
+        connection.commit()
+
+    def pragma(statement: str):
+        return connection.execute(f"PRAGMA {statement}").fetchone()[0]
+
+    page_size = pragma("page_size")
+    pages_before = pragma("page_count")
+
+    # Free pages can only be reclaimed incrementally once auto vacuum is
+    # enabled, which needs one full vacuum for databases created without it.
+    if pragma("auto_vacuum") == AUTO_VACUUM_INCREMENTAL:
+        connection.execute("PRAGMA incremental_vacuum").fetchall()
+    else:
+        connection.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+        connection.execute("VACUUM")
+
+    # Without any statistics yet, `PRAGMA optimize` might not analyze at all.
+    analyzed = not connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+    ).fetchone()
+    connection.execute("ANALYZE" if analyzed else "PRAGMA optimize")
+
+    _, log_frames, checkpointed_frames = connection.execute(
+        "PRAGMA wal_checkpoint(TRUNCATE)"
+    ).fetchone()
+
+    integrity = None
+    if integrity_check:
+        problems = [row[0] for row in connection.execute("PRAGMA quick_check")]
+        integrity = "; ".join(problems)
+
+    return models.MaintenanceReport(
+        started_at=started_at,
+        duration_seconds=time.perf_counter() - start,
+        reclaimed_bytes=(pages_before - pragma("page_count")) * page_size,
+        free_bytes=pragma("freelist_count") * page_size,
+        analyzed=analyzed,
+        checkpointed_frames=checkpointed_frames if log_frames >= 0 else None,
+        integrity=integrity,
+    )
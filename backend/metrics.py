@@ -0,0 +1,274 @@
+import bisect
+import contextvars
+import dataclasses
+import logging
+import threading
+import time
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.middleware.base import BaseHTTPMiddleware
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Metric:
+    kind: str
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple, **extra) -> str:
+        pairs = [*zip(self.labelnames, key), *extra.items()]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            for key in sorted(self._values):
+                lines.extend(self._render_samples(key))
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self, key: tuple):
+        yield f"{self.name}{self._labels(key)} {self._values[key]}"
+
+
+@dataclasses.dataclass
+class _HistogramValue:
+    buckets: list[int]
+    sum: float = 0.0
+    count: int = 0
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = _HistogramValue([0] * len(self.buckets))
+
+            idx = bisect.bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                entry.buckets[idx] += 1
+            entry.sum += value
+            entry.count += 1
+
+    def _render_samples(self, key: tuple):
+        entry = self._values[key]
+
+        cumulative = 0
+        for bucket, count in zip(self.buckets, entry.buckets):
+            cumulative += count
+            yield f"{self.name}_bucket{self._labels(key, le=bucket)} {cumulative}"
+        yield f"{self.name}_bucket{self._labels(key, le='+Inf')} {entry.count}"
+        yield f"{self.name}_sum{self._labels(key)} {entry.sum}"
+        yield f"{self.name}_count{self._labels(key)} {entry.count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return (
+            "\n".join(line for metric in self._metrics for line in metric.render())
+            + "\n"
+        )
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests.",
+    ["method", "route", "status"],
+)
+request_sql_statements = registry.histogram(
+    "http_request_sql_statements",
+    "Number of SQL statements executed per HTTP request.",
+    ["method", "route"],
+    buckets=COUNT_BUCKETS,
+)
+request_sql_duration = registry.histogram(
+    "http_request_sql_duration_seconds",
+    "Time spent executing SQL statements per HTTP request.",
+    ["method", "route"],
+)
+metadata_fetch_duration = registry.histogram(
+    "metadata_fetch_duration_seconds",
+    "Latency of fetching movie metadata from the metadata source.",
+)
+movie_cache_requests = registry.counter(
+    "movie_cache_requests_total",
+    "Movie lookups, by whether the movie was stored (hit), prefetched "
+    "(prefetched), fetched (miss) or shared a concurrent fetch (coalesced).",
+    ["result"],
+)
+prefetches = registry.counter(
+    "movie_prefetches_total",
+    "Speculative movie metadata fetches, by whether they were done, failed or "
+    "were cancelled before starting.",
+    ["result"],
+)
+write_queue_batch_size = registry.histogram(
+    "write_queue_batch_size",
+    "Number of writes committed together by the write queue.",
+    buckets=COUNT_BUCKETS,
+)
+write_queue_commit_duration = registry.histogram(
+    "write_queue_commit_duration_seconds",
+    "Time to run and commit a batch of writes in the write queue.",
+)
+spectator_snapshots = registry.counter(
+    "spectator_snapshots_total",
+    "Spectator snapshots serialized, once per game version with spectators.",
+)
+requests_shed = registry.counter(
+    "http_requests_shed_total",
+    "Requests rejected with 429, by reason (rate_limit or overload) and priority.",
+    ["reason", "priority"],
+)
+maintenance_runs = registry.counter(
+    "db_maintenance_runs_total",
+    "Database maintenance runs, by whether they succeeded.",
+    ["result"],
+)
+maintenance_reclaimed_bytes = registry.counter(
+    "db_maintenance_reclaimed_bytes_total",
+    "Bytes of free pages returned to the file system by database maintenance.",
+)
+maintenance_duration = registry.histogram(
+    "db_maintenance_duration_seconds",
+    "Duration of database maintenance runs.",
+)
+state_transitions = registry.counter(
+    "game_state_transitions_total",
+    "Game state transitions, by the entered state.",
+    ["state"],
+)
+
+
+@dataclasses.dataclass
+class RequestStats:
+    sql_statements: int = 0
+    sql_seconds: float = 0.0
+    queries: list[tuple[str, float]] | None = None
+
+
+_current_request: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+def instrument_engine(engine: Engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+
+        stats = _current_request.get()
+        if stats is None:
+            return
+
+        stats.sql_statements += 1
+        stats.sql_seconds += elapsed
+        if stats.queries is not None:
+            stats.queries.append((statement, elapsed))
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        slow_threshold = getattr(request.app.state, "slow_request_threshold", None)
+
+        stats = RequestStats(queries=[] if slow_threshold is not None else None)
+        token = _current_request.set(stats)
+
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            _current_request.reset(token)
+        elapsed = time.perf_counter() - start
+
+        # Label by route template to keep the number of series bounded.
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+
+        request_duration.observe(
+            elapsed,
+            method=request.method,
+            route=route_path,
+            status=response.status_code,
+        )
+        request_sql_statements.observe(
+            stats.sql_statements, method=request.method, route=route_path
+        )
+        request_sql_duration.observe(
+            stats.sql_seconds, method=request.method, route=route_path
+        )
+
+        if slow_threshold is not None and elapsed >= slow_threshold:
+            logger.warning(
+                "Slow request %s %s took %.1f ms (%d SQL statements, %.1f ms):\n%s",
+                request.method,
+                request.url.path,
+                elapsed * 1000,
+                stats.sql_statements,
+                stats.sql_seconds * 1000,
+                "\n".join(
+                    f"  [{duration * 1000:.2f} ms] {statement}"
+                    for statement, duration in stats.queries
+                ),
+            )
+
+        return response
@@ -1,6 +1,10 @@
+import functools
+import typing
 from collections.abc import Mapping
+from datetime import datetime, timezone
+from typing import Any, Literal, TypeVar
 
-from sqlmodel import Field, SQLModel, Relationship
+from sqlmodel import JSON, Column, Field, SQLModel, Relationship
 
 
 class RoundBase(SQLModel):
@@ -37,6 +41,8 @@ class MovieBase(SQLModel):
 
 class Movie(MovieBase, table=True):
     id: int | None = Field(default=None, primary_key=True)
+    name: str = Field(index=True, unique=True)
+    requested_name: str = Field(index=True)
     submissions: list["Submission"] = Relationship(back_populates="movie")
 
 
@@ -59,6 +65,7 @@ class SubmissionBase(SQLModel):
 
 class Submission(SubmissionBase, table=True):
     id: int | None = Field(default=None, primary_key=True)
+    vote_count: int = 0  # Denormalized, maintained by `GameManager.add_vote`.
     round: Round = Relationship(back_populates="submissions")
     submitting_user: "User" = Relationship(
         back_populates="submitted_submissions",
@@ -85,6 +92,10 @@ class SubmissionCreate(SubmissionBase):
     comment: str | None = None
 
 
+class MoviePrefetch(SQLModel):
+    name: str = Field(min_length=1)
+
+
 class CommentBase(SQLModel):
     submission_id: int | None = Field(default=None, foreign_key="submission.id")
     author_id: int | None = Field(default=None, foreign_key="user.id")
@@ -135,6 +146,223 @@ class VoteCreate(SQLModel):
     all_comments: Mapping[int, str]
 
 
+class SubmissionResult(SQLModel):
+    submission_id: int
+    movie_id: int
+    movie_name: str
+    submitting_user: UserPublic
+    votes: int
+
+
+class PlayerScore(SQLModel):
+    user: UserPublic
+    score: int
+
+
+class RoundResults(SQLModel):
+    round_id: int
+    prompt: str
+    submissions: list[SubmissionResult]
+    winners: list[int]
+    scores: list[PlayerScore]
+
+
+# A round of the history, shown with its results.
+class RoundWithResults(RoundPublicWithSubmissions):
+    results: RoundResults
+
+
+class PlayerStats(SQLModel, table=True):
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    wins: int = Field(default=0, index=True)
+    submissions: int = 0
+    votes_received: int = Field(default=0, index=True)
+    votes_cast: int = 0
+
+
+class PlayerStatsPublic(SQLModel):
+    user: UserPublic
+    wins: int
+    submissions: int
+    votes_received: int
+    votes_cast: int
+
+
+class MovieStats(SQLModel, table=True):
+    movie_id: int = Field(foreign_key="movie.id", primary_key=True)
+    name: str
+    submissions: int = Field(default=0, index=True)
+    votes: int = 0
+
+
+class GenreStats(SQLModel, table=True):
+    genre: str = Field(primary_key=True)
+    submissions: int = 0
+    votes: int = Field(default=0, index=True)
+
+
+class VotingAffinity(SQLModel, table=True):
+    voter_id: int = Field(foreign_key="user.id", primary_key=True)
+    submitter_id: int = Field(foreign_key="user.id", primary_key=True)
+    votes: int = Field(default=0, index=True)
+
+
+class VotingAffinityPublic(SQLModel):
+    voter: UserPublic
+    submitter: UserPublic
+    votes: int
+
+
+# Rounds which have already been folded into the stats tables.
+class StatsRound(SQLModel, table=True):
+    round_id: int = Field(foreign_key="round.id", primary_key=True)
+
+
+class ArchivedRound(SQLModel):
+    round: RoundPublicWithSubmissions
+    results: RoundResults
+
+
+# Scores from archived rounds, so that running scores stay complete.
+class ArchivedScore(SQLModel, table=True):
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    score: int = 0
+
+
+class GameEventBase(SQLModel):
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    type: str = Field(index=True)
+    payload: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+
+
+# Append-only, rows are never updated or deleted.
+class GameEvent(GameEventBase, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+
+
+class GameEventPublic(GameEventBase):
+    id: int
+
+
+class GameStateSnapshot(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    event_id: int = Field(foreign_key="gameevent.id")
+    state: str
+    round_id: int | None = None
+
+
+class VotePublic(SQLModel):
+    submission_id: int
+    user: UserPublic
+
+
+# Changes of the current round since a version, which is a `GameEvent` id.
+class RoundDelta(SQLModel):
+    version: int
+    round: RoundPublicWithSubmissions | None = None  # Set if a full reload is needed.
+    submissions: list[SubmissionPublic] = []
+    votes: list[VotePublic] = []
+    comments: list[CommentPublic] = []
+
+
 class CurrentState(SQLModel):
     state: str
     player_state: str | None = None
+    deadline: datetime | None = None
+
+
+class Snapshot(SQLModel):
+    version: int  # For `GET /round?since=<version>`, a `GameEvent` id.
+    state: CurrentState
+    round: RoundPublicWithSubmissions | None
+    results: RoundResults | None
+    rounds: list[RoundWithResults]
+
+
+# What spectators see, shared by all of them for a version (a `GameEvent` id).
+class SpectatorSnapshot(SQLModel):
+    version: int
+    state: CurrentState
+    round: RoundPublicWithSubmissions | None
+    results: RoundResults | None
+
+
+class MaintenanceReport(SQLModel):
+    started_at: datetime
+    duration_seconds: float
+    reclaimed_bytes: int
+    free_bytes: int
+    analyzed: bool  # Whether the planner statistics were built from scratch.
+    checkpointed_frames: int | None  # Only with a write-ahead log.
+    integrity: str | None  # "ok" if checked and fine.
+
+
+class SearchHighlight(SQLModel):
+    text: str
+    match: bool
+
+
+class SearchHit(SQLModel):
+    field: Literal["prompt", "comment"]
+    round_id: int
+    submission_id: int | None
+    highlights: list[SearchHighlight]
+
+
+PublicModel = TypeVar("PublicModel", bound=SQLModel)
+
+
+@functools.cache
+def _fields(model: type[SQLModel]) -> tuple[tuple[str, type[SQLModel] | None, bool]]:
+    # Every field with its nested model, if any, and whether it is a list of them.
+    hints = typing.get_type_hints(model)
+
+    fields = []
+    for name in model.model_fields:
+        hint = hints[name]
+        many = typing.get_origin(hint) is list
+        if many:
+            (hint,) = typing.get_args(hint)
+        nested = hint if isinstance(hint, type) and issubclass(hint, SQLModel) else None
+        fields.append((name, nested, many))
+    return tuple(fields)
+
+
+def from_row(
+    model: type[PublicModel], row: SQLModel, _built: dict | None = None
+) -> PublicModel:
+    """Build a public model from a database row, without validating it again.
+
+    Rows of our own database were validated when they were written, so this
+    is only for them and not for any input. Even `model_construct` is slower
+    than validating, so instances are set up directly. Rows appearing several
+    times, like the players voting, are only converted once.
+    """
+    if _built is None:
+        _built = {}
+
+    key = (model, id(row))
+    instance = _built.get(key)
+    if instance is not None:
+        return instance
+
+    # Loaded columns and relationships are read without the ORM descriptors.
+    loaded = row.__dict__
+    values = {}
+    for name, nested, many in _fields(model):
+        value = loaded[name] if name in loaded else getattr(row, name)
+        if nested is not None:
+            value = (
+                [from_row(nested, item, _built) for item in value]
+                if many
+                else from_row(nested, value, _built)
+            )
+        values[name] = value
+
+    instance = object.__new__(model)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", set(values))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    _built[key] = instance
+    return instance
@@ -0,0 +1,88 @@
+import collections
+import logging
+import threading
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Generic, TypeVar
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LRUCache(Generic[T]):
+    """Results of prefetches, forgetting the least recently used ones first."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries: collections.OrderedDict[Hashable, T] = collections.OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: Hashable, value: T):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> T | None:
+        with self._lock:
+            return self._entries.pop(key, None)
+
+
+class Prefetcher:
+    """Runs speculative work in the background, at most one job per owner.
+
+    Only `max_concurrency` jobs run at once, so prefetching never takes more
+    than that from the requests which actually need the results. A new job
+    replaces the previous one of its owner, which is cancelled unless it
+    already started.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self._executor = ThreadPoolExecutor(
+            max_concurrency, thread_name_prefix="prefetch"
+        )
+        self._lock = threading.Lock()
+        self._pending: dict[Hashable, Future] = {}
+
+    def submit(self, owner: Hashable, function: Callable[[], object]):
+        self.cancel(owner)
+
+        future = self._executor.submit(self._run, function)
+        with self._lock:
+            self._pending[owner] = future
+        future.add_done_callback(lambda future: self._forget(owner, future))
+
+    def cancel(self, owner: Hashable):
+        """Cancel the job of the owner, unless it already started."""
+        with self._lock:
+            future = self._pending.pop(owner, None)
+        if future is not None and future.cancel():
+            metrics.prefetches.inc(result="cancelled")
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+    def _forget(self, owner: Hashable, future: Future):
+        with self._lock:
+            if self._pending.get(owner) is future:
+                del self._pending[owner]
+
+    def _run(self, function: Callable[[], object]):
+        # Speculative work failing is of no concern to anybody.
+        try:
+            function()
+        except Exception:
+            metrics.prefetches.inc(result="failed")
+            logger.debug("Prefetch failed", exc_info=True)
+        else:
+            metrics.prefetches.inc(result="done")
@@ -0,0 +1,218 @@
+import collections
+import contextlib
+import cProfile
+import dataclasses
+import functools
+import inspect
+import itertools
+import marshal
+import pathlib
+import sys
+import threading
+import time
+from typing import Literal
+
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+
+ProfilingMode = Literal["sample", "cprofile"]
+
+
+class ProfilingRequest(BaseModel):
+    route: str
+    method: str | None = None
+    samples: int | None = 1  # Number of requests to profile, `None` is unlimited.
+    mode: ProfilingMode = "sample"
+    interval_ms: float = 1.0
+
+
+class ProfileInfo(BaseModel):
+    id: int
+    method: str
+    route: str
+    mode: ProfilingMode
+    duration_ms: float
+
+
+@dataclasses.dataclass
+class CapturedProfile:
+    info: ProfileInfo
+    data: bytes  # Folded stacks for "sample", marshalled pstats for "cprofile".
+
+
+class _Sampler(threading.Thread):
+    """Periodically records the stack of another thread as folded stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> bytes:
+        self._stopped.set()
+        self.join()
+
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.items()
+        ).encode()
+
+
+class Profiler:
+    def __init__(self, max_profiles: int = 50):
+        self._lock = threading.Lock()
+        self._targets: dict[tuple[str | None, str], ProfilingRequest] = {}
+        self._profiles: collections.deque[CapturedProfile] = collections.deque(
+            maxlen=max_profiles
+        )
+        self._ids = itertools.count(1)
+
+    @property
+    def targets(self) -> list[ProfilingRequest]:
+        return list(self._targets.values())
+
+    @property
+    def profiles(self) -> list[ProfileInfo]:
+        return [profile.info for profile in self._profiles]
+
+    def get_profile(self, profile_id: int) -> CapturedProfile | None:
+        return next(
+            (profile for profile in self._profiles if profile.info.id == profile_id),
+            None,
+        )
+
+    def enable(self, request: ProfilingRequest):
+        method = request.method.upper() if request.method else None
+        with self._lock:
+            self._targets[(method, request.route)] = request.model_copy()
+
+    def disable(self):
+        with self._lock:
+            self._targets.clear()
+
+    def _claim(
+        self, methods: set[str], route: str
+    ) -> tuple[str | None, ProfilingRequest | None]:
+        # Fast path, this is all the overhead while profiling is off.
+        if not self._targets:
+            return None, None
+
+        with self._lock:
+            for method in [*methods, None]:
+                target = self._targets.get((method, route))
+                if target is None:
+                    continue
+
+                if target.samples is not None:
+                    target.samples -= 1
+                    if target.samples <= 0:
+                        del self._targets[(method, route)]
+
+                return method or "/".join(sorted(methods)), target
+
+        return None, None
+
+    @contextlib.contextmanager
+    def _profile(self, method: str, route: str, target: ProfilingRequest):
+        if target.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # Another profiler is active in this thread.
+                yield
+                return
+        else:
+            sampler = _Sampler(threading.get_ident(), target.interval_ms / 1000)
+            sampler.start()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+
+            if target.mode == "cprofile":
+                profile.disable()
+                profile.create_stats()
+                data = marshal.dumps(profile.stats)
+            else:
+                data = sampler.stop()
+
+            self._profiles.append(
+                CapturedProfile(
+                    info=ProfileInfo(
+                        id=next(self._ids),
+                        method=method,
+                        route=route,
+                        mode=target.mode,
+                        duration_ms=duration * 1000,
+                    ),
+                    data=data,
+                )
+            )
+
+    def wrap(self, endpoint, route: str, methods: set[str]):
+        if inspect.iscoroutinefunction(endpoint):
+
+            @functools.wraps(endpoint)
+            async def wrapper(*args, **kwargs):
+                method, target = self._claim(methods, route)
+                if target is None:
+                    return await endpoint(*args, **kwargs)
+
+                with self._profile(method, route, target):
+                    return await endpoint(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(endpoint)
+            def wrapper(*args, **kwargs):
+                method, target = self._claim(methods, route)
+                if target is None:
+                    return endpoint(*args, **kwargs)
+
+                with self._profile(method, route, target):
+                    return endpoint(*args, **kwargs)
+
+        wrapper.profiled_endpoint = endpoint
+        return wrapper
+
+    def write_profiles(self, directory: pathlib.Path):
+        directory.mkdir(parents=True, exist_ok=True)
+
+        for profile in self._profiles:
+            info = profile.info
+            suffix = "folded" if info.mode == "sample" else "pstats"
+            name = f"{info.id}-{info.method}{info.route.replace('/', '_')}.{suffix}"
+            (directory / name).write_bytes(profile.data)
+
+
+profiler = Profiler()
+
+
+class ProfiledRoute(APIRoute):
+    """Route whose requests can be profiled on demand via `profiler`."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        # Routes are re-created when routers are included, avoid double wrapping.
+        endpoint = getattr(endpoint, "profiled_endpoint", endpoint)
+        methods = {method.upper() for method in kwargs.get("methods") or ["GET"]}
+
+        super().__init__(path, profiler.wrap(endpoint, path, methods), **kwargs)
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, HTTPException, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+
+from backend import history, models, profiling
+from backend.routes import login_system
+
+
+router = APIRouter(prefix="/admin")
+
+
+@router.get("/profiling")
+def get_profiling(
+    *,
+    current_user: login_system.AdminUser,
+) -> list[profiling.ProfilingRequest]:
+    return profiling.profiler.targets
+
+
+@router.post("/profiling")
+def enable_profiling(
+    *,
+    current_user: login_system.AdminUser,
+    profiling_request: profiling.ProfilingRequest,
+) -> list[profiling.ProfilingRequest]:
+    profiling.profiler.enable(profiling_request)
+    return profiling.profiler.targets
+
+
+@router.delete("/profiling")
+def disable_profiling(*, current_user: login_system.AdminUser):
+    profiling.profiler.disable()
+
+
+@router.get("/profiles")
+def get_profiles(
+    *,
+    current_user: login_system.AdminUser,
+) -> list[profiling.ProfileInfo]:
+    return profiling.profiler.profiles
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(*, current_user: login_system.AdminUser, profile_id: int):
+    profile = profiling.profiler.get_profile(profile_id)
+
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile '{profile_id}' not found.",
+        )
+
+    if profile.info.mode == "sample":
+        # Folded stacks, as consumed by flamegraph.pl or speedscope.
+        return Response(profile.data, media_type="text/plain")
+    return Response(
+        profile.data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+    )
+
+
+@router.get("/export")
+def export_history(
+    *, request: Request, current_user: login_system.AdminUser
+) -> StreamingResponse:
+    manager = request.app.state.game_manager
+    records = history.export_records(manager.sql_session, manager.round_archive)
+    return StreamingResponse(
+        history.to_ndjson(records), media_type="application/x-ndjson"
+    )
+
+
+@router.post("/import")
+def import_history(
+    *, request: Request, current_user: login_system.AdminUser, file: UploadFile
+) -> dict[str, int]:
+    # Uploads are spooled to disk, so large files are streamed line by line.
+    manager = request.app.state.game_manager
+    with manager.sql_session() as session:
+        return history.import_records(
+            session,
+            history.from_ndjson(file.file),
+            manager.round_archive,
+            manager.open_round_id(),
+        )
+
+
+@router.get("/maintenance")
+def get_maintenance(
+    *, request: Request, current_user: login_system.AdminUser
+) -> models.MaintenanceReport | None:
+    return request.app.state.game_manager.last_maintenance_report
+
+
+@router.post("/maintenance")
+def run_maintenance(
+    *, request: Request, current_user: login_system.AdminUser
+) -> models.MaintenanceReport:
+    return request.app.state.game_manager.run_maintenance()
@@ -1,10 +1,10 @@
 from fastapi import Request, APIRouter, HTTPException
 
-from backend import models, game_manager
+from backend import models, game_manager, profiling
 from backend.routes import login_system
 
 
-router = APIRouter()
+router = APIRouter(route_class=profiling.ProfiledRoute)
 
 
 @router.get("/state")
@@ -13,13 +13,39 @@ def get_state(
     request: Request,
     current_user: login_system.AuthenticatedUser,
 ) -> models.CurrentState:
+    request.app.state.game_manager.heartbeat(current_user.username)
     return request.app.state.game_manager.get_current_state_message(
         current_user.username
     )
 
 
+@router.post("/heartbeat")
+def heartbeat(*, request: Request, current_user: login_system.AuthenticatedUser):
+    request.app.state.game_manager.heartbeat(current_user.username)
+
+
+@router.get("/snapshot")
+def get_snapshot(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+    history_offset: int = 0,
+    history_limit: int = 10,
+) -> models.Snapshot:
+    request.app.state.game_manager.heartbeat(current_user.username)
+    return request.app.state.game_manager.get_snapshot(
+        current_user.username, history_offset, history_limit
+    )
+
+
 @router.get("/round")
-def get_round(*, request: Request) -> models.RoundPublicWithSubmissions:
+def get_round(
+    *, request: Request, since: int | None = None
+) -> models.RoundPublicWithSubmissions | models.RoundDelta:
+    # With `since`, only what changed after that version is returned.
+    if since is not None:
+        return request.app.state.game_manager.get_round_delta(since)
+
     return request.app.state.game_manager.get_current_round()
 
 
@@ -42,8 +68,29 @@ def get_rounds(
     *,
     request: Request,
     current_user: login_system.AuthenticatedUser,
-) -> list[models.RoundPublicWithSubmissions]:
-    return request.app.state.game_manager.get_all_rounds()
+    offset: int = 0,
+    limit: int | None = None,
+) -> list[models.RoundWithResults]:
+    return request.app.state.game_manager.get_all_rounds(offset, limit)
+
+
+@router.get("/results")
+def get_current_results(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+) -> models.RoundResults:
+    return request.app.state.game_manager.get_round_results()
+
+
+@router.get("/results/{round_id}")
+def get_results(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+    round_id: int,
+) -> models.RoundResults:
+    return request.app.state.game_manager.get_round_results(round_id)
 
 
 @router.post("/submissions/")
@@ -60,10 +107,25 @@ def add_submission(
         current_user.username, submission
     )
 
+    request.app.state.game_manager.heartbeat(current_user.username)
     request.app.state.game_manager.update()
     return db_submission
 
 
+@router.post("/submissions/prefetch", status_code=202)
+def prefetch_submission(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+    prefetch: models.MoviePrefetch,
+):
+    # Only warms the movie cache, so it answers right away and never fails.
+    if request.app.state.game_manager.is_in_state(game_manager.SubmissionState):
+        request.app.state.game_manager.prefetch_movie(
+            current_user.username, prefetch.name
+        )
+
+
 @router.post("/vote/")
 def add_vote(
     *,
@@ -76,6 +138,7 @@ def add_vote(
 
     request.app.state.game_manager.add_vote(current_user.username, vote)
 
+    request.app.state.game_manager.heartbeat(current_user.username)
     request.app.state.game_manager.update()
     return request.app.state.game_manager.get_current_state_message(
         current_user.username
@@ -101,3 +164,24 @@ def add_comment(
     comment: models.CommentCreate,
 ):
     request.app.state.game_manager.add_comment(current_user.username, comment)
+
+
+@router.post("/comments/batch/")
+def add_comments(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+    comments: list[models.CommentCreate],
+):
+    request.app.state.game_manager.add_comments(current_user.username, comments)
+
+
+@router.get("/events")
+def get_events(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+    after: int = 0,
+    limit: int = 100,
+) -> list[models.GameEventPublic]:
+    return request.app.state.game_manager.get_events(after, limit)
@@ -69,6 +69,17 @@ def create_access_token(data: dict, settings: Settings):
     return encoded_jwt
 
 
+def token_username(token: str, settings: Settings) -> str | None:
+    """Username a token was issued to, or `None` if it is not valid."""
+    try:
+        payload = jwt.decode(
+            token, settings.jwt_secret_key, algorithms=[settings.algorithm]
+        )
+    except InvalidTokenError:
+        return None
+    return payload.get("sub")
+
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     settings: AppSettings,
@@ -79,16 +90,10 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(
-            token, settings.jwt_secret_key, algorithms=[settings.algorithm]
-        )
-        username = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except InvalidTokenError:
+    username = token_username(token, settings)
+    if username is None:
         raise credentials_exception
+    token_data = TokenData(username=username)
 
     user = get_user(settings.user_database, username=token_data.username)
     if user is None:
@@ -99,6 +104,18 @@ async def get_current_user(
 AuthenticatedUser = Annotated[User, Depends(get_current_user)]
 
 
+async def get_admin_user(current_user: AuthenticatedUser, settings: AppSettings):
+    if current_user.username not in settings.admin_users:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
+
+
+AdminUser = Annotated[User, Depends(get_admin_user)]
+
+
 @router.post("/token")
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
@@ -0,0 +1,20 @@
+from fastapi import Request, APIRouter
+
+from backend import models, profiling, search
+from backend.routes import login_system
+
+
+router = APIRouter(route_class=profiling.ProfiledRoute)
+
+
+@router.get("/search")
+def search_history(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+    q: str,
+    offset: int = 0,
+    limit: int = 20,
+) -> list[models.SearchHit]:
+    with request.app.state.game_manager.sql_session() as session:
+        return search.search(session, q, offset, limit)
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+
+from backend import models
+
+
+router = APIRouter()
+
+
+# Spectators do not log in, and all of them get the same shared bytes.
+@router.get("/spectate", responses={200: {"model": models.SpectatorSnapshot}})
+async def get_spectator_snapshot(*, request: Request) -> Response:
+    version, snapshot = await request.app.state.spectators.latest()
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Spectator snapshot not available yet.",
+        )
+
+    etag = f'"{version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return Response(snapshot, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/spectate/events")
+async def stream_spectator_snapshots(*, request: Request) -> StreamingResponse:
+    return StreamingResponse(
+        request.app.state.spectators.subscribe(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
@@ -0,0 +1,51 @@
+from fastapi import Request, APIRouter
+
+from backend import models, profiling, stats
+from backend.routes import login_system
+
+
+router = APIRouter(route_class=profiling.ProfiledRoute)
+
+
+@router.get("/stats/players")
+def get_player_stats(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+    limit: int = 10,
+) -> list[models.PlayerStatsPublic]:
+    with request.app.state.game_manager.sql_session() as session:
+        return stats.get_player_stats(session, limit)
+
+
+@router.get("/stats/movies")
+def get_movie_stats(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+    limit: int = 10,
+) -> list[models.MovieStats]:
+    with request.app.state.game_manager.sql_session() as session:
+        return stats.get_movie_stats(session, limit)
+
+
+@router.get("/stats/genres")
+def get_genre_stats(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+    limit: int = 10,
+) -> list[models.GenreStats]:
+    with request.app.state.game_manager.sql_session() as session:
+        return stats.get_genre_stats(session, limit)
+
+
+@router.get("/stats/affinity")
+def get_voting_affinity(
+    *,
+    request: Request,
+    current_user: login_system.AuthenticatedUser,
+    limit: int = 10,
+) -> list[models.VotingAffinityPublic]:
+    with request.app.state.game_manager.sql_session() as session:
+        return stats.get_voting_affinity(session, limit)
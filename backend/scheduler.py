@@ -0,0 +1,42 @@
+import asyncio
+import logging
+import time
+
+from . import game_manager
+
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Wakes the game manager up when a deadline passes or a player goes idle."""
+
+    def __init__(self, manager: "game_manager.GameManager"):
+        self.manager = manager
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        # Called from request threads whenever the next wakeup might change.
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._changed.set)
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+
+        while True:
+            self._changed.clear()
+
+            try:
+                wakeup = self.manager.next_wakeup()
+                timeout = None if wakeup is None else max(wakeup - time.monotonic(), 0)
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                    continue
+                except TimeoutError:
+                    pass
+
+                await asyncio.to_thread(self.manager.check_deadline)
+            except Exception:
+                logger.exception("Checking the deadline failed")
+                await asyncio.sleep(1)
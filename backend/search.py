@@ -0,0 +1,107 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
+
+from . import models
+
+
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+# Rounds and comments are never edited, so only inserts need to be tracked.
+# Deletes are not tracked on purpose, archived rounds stay searchable.
+SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE search_index USING fts5(
+        text, field UNINDEXED, round_id UNINDEXED, submission_id UNINDEXED
+    )
+    """,
+    """
+    CREATE TRIGGER search_index_round_insert AFTER INSERT ON "round" BEGIN
+        INSERT INTO search_index(text, field, round_id, submission_id)
+        VALUES (new.prompt, 'prompt', new.id, NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER search_index_comment_insert AFTER INSERT ON "comment" BEGIN
+        INSERT INTO search_index(text, field, round_id, submission_id)
+        VALUES (
+            new.text,
+            'comment',
+            (SELECT round_id FROM submission WHERE id = new.submission_id),
+            new.submission_id
+        );
+    END
+    """,
+    # Index everything written before the index existed.
+    """
+    INSERT INTO search_index(text, field, round_id, submission_id)
+    SELECT prompt, 'prompt', id, NULL FROM "round"
+    """,
+    """
+    INSERT INTO search_index(text, field, round_id, submission_id)
+    SELECT comment.text, 'comment', submission.round_id, comment.submission_id
+    FROM "comment" JOIN submission ON submission.id = comment.submission_id
+    """,
+]
+
+
+def setup(connection: Connection):
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE name = 'search_index'"
+    ).first()
+    if exists:
+        return
+
+    for statement in SCHEMA:
+        connection.exec_driver_sql(statement)
+
+
+def _match_expression(query: str) -> str:
+    # Quote every word so that user input is never parsed as query syntax,
+    # the last word also matches as a prefix for search-as-you-type.
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    return " ".join(terms) + "*"
+
+
+def _highlights(snippet: str) -> list[models.SearchHighlight]:
+    head, *parts = snippet.split(HIGHLIGHT_START)
+
+    highlights = [models.SearchHighlight(text=head, match=False)]
+    for part in parts:
+        match, _, rest = part.partition(HIGHLIGHT_END)
+        highlights.append(models.SearchHighlight(text=match, match=True))
+        highlights.append(models.SearchHighlight(text=rest, match=False))
+
+    return [highlight for highlight in highlights if highlight.text]
+
+
+def search(
+    session: Session, query: str, offset: int, limit: int
+) -> list[models.SearchHit]:
+    if not query.split():
+        return []
+
+    return [
+        models.SearchHit(
+            field=field,
+            round_id=round_id,
+            submission_id=submission_id,
+            highlights=_highlights(snippet),
+        )
+        for field, round_id, submission_id, snippet in session.execute(
+            text(
+                "SELECT field, round_id, submission_id, "
+                "snippet(search_index, 0, :start, :end, '…', 32) "
+                "FROM search_index WHERE search_index MATCH :query "
+                "ORDER BY rank LIMIT :limit OFFSET :offset"
+            ),
+            {
+                "start": HIGHLIGHT_START,
+                "end": HIGHLIGHT_END,
+                "query": _match_expression(query),
+                "limit": limit,
+                "offset": offset,
+            },
+        )
+    ]
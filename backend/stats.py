@@ -0,0 +1,230 @@
+import argparse
+
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, SQLModel, delete, select
+
+from . import archive, models
+
+
+SUMMARY_TABLES = [
+    models.PlayerStats,
+    models.MovieStats,
+    models.GenreStats,
+    models.VotingAffinity,
+    models.StatsRound,
+]
+
+
+class _Counters:
+    """Get-or-create helper for counter rows, also seeing not yet flushed rows."""
+
+    def __init__(self, session: Session):
+        self._session = session
+        self._rows = {}
+
+    def increment(
+        self,
+        model: type[SQLModel],
+        key: dict,
+        defaults: dict | None = None,
+        **deltas: int,
+    ):
+        cache_key = (model, *key.values())
+
+        row = self._rows.get(cache_key)
+        if row is None:
+            row = self._session.get(model, tuple(key.values()))
+            if row is None:
+                row = model(**key, **(defaults or {}))
+            self._rows[cache_key] = row
+
+        for field, delta in deltas.items():
+            setattr(row, field, getattr(row, field) + delta)
+
+        return row
+
+    def add_all(self):
+        self._session.add_all(self._rows.values())
+
+
+def record_round(
+    session: Session,
+    round_id: int,
+    submissions: list[models.SubmissionPublic] | None = None,
+):
+    """Fold a finished round into the summary tables.
+
+    Only the rows of this round are read, so the cost is independent of the
+    amount of history. Rounds which were already recorded are skipped.
+    Archived rounds are no longer in the database and pass their submissions.
+    """
+    if session.get(models.StatsRound, round_id) is not None:
+        return
+
+    counters = _Counters(session)
+
+    if submissions is None:
+        submissions = session.exec(
+            select(models.Submission).where(models.Submission.round_id == round_id)
+        ).all()
+
+    votes = [len(submission.voting_users) for submission in submissions]
+    top_votes = max(votes, default=0)
+
+    for submission, vote_count in zip(submissions, votes):
+        counters.increment(
+            models.PlayerStats,
+            {"user_id": submission.submitting_user_id},
+            submissions=1,
+            votes_received=vote_count,
+            wins=int(top_votes > 0 and vote_count == top_votes),
+        )
+        counters.increment(
+            models.MovieStats,
+            {"movie_id": submission.movie_id},
+            {"name": submission.movie.name},
+            submissions=1,
+            votes=vote_count,
+        )
+
+        for genre in submission.movie.genre.split(";"):
+            if genre:
+                counters.increment(
+                    models.GenreStats,
+                    {"genre": genre},
+                    submissions=1,
+                    votes=vote_count,
+                )
+
+        for voter in submission.voting_users:
+            counters.increment(models.PlayerStats, {"user_id": voter.id}, votes_cast=1)
+            counters.increment(
+                models.VotingAffinity,
+                {"voter_id": voter.id, "submitter_id": submission.submitting_user_id},
+                votes=1,
+            )
+
+    counters.add_all()
+    session.add(models.StatsRound(round_id=round_id))
+
+
+def rebuild(
+    session: Session,
+    round_archive: archive.RoundArchive,
+    open_round_id: int | None = None,
+):
+    """Recompute all summary tables from the full game history.
+
+    The round still being played, if any, is left out. It is recorded once
+    it ends, which would be skipped if it was recorded already.
+    """
+    for table in SUMMARY_TABLES:
+        session.exec(delete(table))
+
+    # Archived rounds are older than all rounds still in the database.
+    for entry in round_archive.iter_rounds():
+        record_round(session, entry.round.id, entry.round.submissions)
+        session.flush()
+
+    query = select(models.Round.id).order_by(models.Round.id)
+    if open_round_id is not None:
+        query = query.where(models.Round.id != open_round_id)
+
+    for round_id in session.exec(query).all():
+        record_round(session, round_id)
+        session.flush()
+
+    session.commit()
+
+
+def get_player_stats(session: Session, limit: int) -> list[models.PlayerStatsPublic]:
+    return [
+        models.PlayerStatsPublic(
+            user=models.UserPublic(id=user.id, name=user.name),
+            wins=player_stats.wins,
+            submissions=player_stats.submissions,
+            votes_received=player_stats.votes_received,
+            votes_cast=player_stats.votes_cast,
+        )
+        for player_stats, user in session.exec(
+            select(models.PlayerStats, models.User)
+            .join(models.User, models.User.id == models.PlayerStats.user_id)
+            .order_by(
+                models.PlayerStats.wins.desc(),
+                models.PlayerStats.votes_received.desc(),
+                models.PlayerStats.user_id,
+            )
+            .limit(limit)
+        )
+    ]
+
+
+def get_movie_stats(session: Session, limit: int) -> list[models.MovieStats]:
+    return session.exec(
+        select(models.MovieStats)
+        .order_by(
+            models.MovieStats.submissions.desc(),
+            models.MovieStats.votes.desc(),
+            models.MovieStats.movie_id,
+        )
+        .limit(limit)
+    ).all()
+
+
+def get_genre_stats(session: Session, limit: int) -> list[models.GenreStats]:
+    return session.exec(
+        select(models.GenreStats)
+        .order_by(
+            models.GenreStats.votes.desc(),
+            models.GenreStats.submissions.desc(),
+            models.GenreStats.genre,
+        )
+        .limit(limit)
+    ).all()
+
+
+def get_voting_affinity(
+    session: Session, limit: int
+) -> list[models.VotingAffinityPublic]:
+    voter = aliased(models.User)
+    submitter = aliased(models.User)
+
+    return [
+        models.VotingAffinityPublic(
+            voter=models.UserPublic(id=voter_id, name=voter_name),
+            submitter=models.UserPublic(id=submitter_id, name=submitter_name),
+            votes=votes,
+        )
+        for voter_id, voter_name, submitter_id, submitter_name, votes in session.exec(
+            select(
+                voter.id,
+                voter.name,
+                submitter.id,
+                submitter.name,
+                models.VotingAffinity.votes,
+            )
+            .join(voter, voter.id == models.VotingAffinity.voter_id)
+            .join(submitter, submitter.id == models.VotingAffinity.submitter_id)
+            .order_by(
+                models.VotingAffinity.votes.desc(),
+                models.VotingAffinity.voter_id,
+                models.VotingAffinity.submitter_id,
+            )
+            .limit(limit)
+        )
+    ]
+
+
+if __name__ == "__main__":
+    from .config import get_settings
+    from .game_manager import GameManager
+
+    parser = argparse.ArgumentParser(description="Maintain the MovieHive stats.")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    manager = GameManager(get_settings())
+    manager.setup_database()
+
+    with manager.sql_session() as session:
+        rebuild(session, manager.round_archive, manager.open_round_id())
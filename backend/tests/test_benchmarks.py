@@ -0,0 +1,41 @@
+import asyncio
+
+from ..benchmarks import (
+    bench_public_models,
+    bench_startup,
+    bench_write_queue,
+    simulate_game,
+)
+
+
+def test_simulate_game_smoke():
+    results = asyncio.run(
+        simulate_game.simulate_in_process(
+            players=2, rounds=1, poll_interval=0.01, metadata_latency=0
+        )
+    )
+
+    assert results["endpoints"]["POST /submissions/"]["count"] == 2
+    assert results["endpoints"]["POST /vote/"]["count"] == 2
+    assert simulate_game.compare(results, results, tolerance=0) == []
+
+
+def test_bench_startup_smoke():
+    results = bench_startup.benchmark(repeat=1)
+
+    for entry in results.values():
+        assert entry["total_ms"] > entry["import_ms"] + entry["setup_ms"]
+
+
+def test_bench_write_queue_smoke():
+    results = bench_write_queue.run(votes=8, concurrency=4, max_batch=4)
+
+    assert results["votes_per_second"] > 0
+
+
+def test_bench_public_models_smoke():
+    results = bench_public_models.benchmark(
+        submissions=3, voters=2, comments=1, repeat=1
+    )
+
+    assert set(results) == {"model_validate", "from_row"}
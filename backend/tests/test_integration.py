@@ -1,15 +1,40 @@
+import asyncio
+import concurrent.futures
+import functools
+import json
+import pathlib
+import threading
+import time
+
 import pytest
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import func, select
 
+from .. import (
+    admission,
+    broadcast,
+    frontend,
+    game_manager,
+    idempotency,
+    metrics,
+    models,
+    stats,
+)
 from ..main import app
 from ..config import Settings, get_settings
 
 
-def get_settings_override(path_prefix):
-    return lambda: Settings(
-        user_database_string="test_user:test_pw test_user2:test_pw2",
-        jwt_secret_key="123",
-        datatbase_directory=path_prefix,
+def get_settings_override(path_prefix, storage="memory"):
+    # Settings hash the passwords, which is slow on purpose, so only do it once.
+    return functools.cache(
+        lambda: Settings(
+            user_database_string="test_user:test_pw test_user2:test_pw2",
+            jwt_secret_key="123",
+            datatbase_directory=path_prefix,
+            storage=storage,
+        )
     )
 
 
@@ -78,6 +103,7 @@ def test_single_round(client):
     assert response.status_code == 200
     assert response.json() == {
         "player_state": None,
+        "deadline": None,
         "state": "OverviewState",
     }
 
@@ -88,6 +114,7 @@ def test_single_round(client):
     assert response.status_code == 200
     assert response.json() == {
         "player_state": "open",
+        "deadline": None,
         "state": "SubmissionState",
     }
 
@@ -153,6 +180,7 @@ def test_single_round(client):
     assert response.status_code == 200
     assert response.json() == {
         "player_state": "closed",
+        "deadline": None,
         "state": "SubmissionState",
     }
 
@@ -200,6 +228,7 @@ def test_single_round(client):
     assert response.status_code == 200
     assert response.json() == {
         "player_state": "open",
+        "deadline": None,
         "state": "VotingState",
     }
 
@@ -288,6 +317,7 @@ def test_single_round(client):
     assert response.status_code == 200
     assert response.json() == {
         "player_state": "closed",
+        "deadline": None,
         "state": "VotingState",
     }
 
@@ -302,6 +332,7 @@ def test_single_round(client):
     assert response.status_code == 200
     assert response.json() == {
         "player_state": None,
+        "deadline": None,
         "state": "OverviewState",
     }
 
@@ -422,6 +453,7 @@ def test_single_round(client):
     assert response.status_code == 200
     assert response.json() == {
         "player_state": None,
+        "deadline": None,
         "state": "OverviewState",
     }
 
@@ -605,3 +637,1309 @@ def test_multiple_rounds(client):
     assert submissions[1]["comments"][1]["text"] == "round1-comment1-submission1"
     assert submissions[1]["comments"][2]["author"]["name"] == "test_user2"
     assert submissions[1]["comments"][2]["text"] == "Final comment (round 1)."
+
+
+def login_players(client) -> dict[str, dict[str, str]]:
+    headers = {}
+    for username, password in [("test_user", "test_pw"), ("test_user2", "test_pw2")]:
+        response = client.post(
+            "/token", data={"username": username, "password": password}
+        )
+        headers[username] = {
+            "Authorization": f"Bearer {response.json()['access_token']}"
+        }
+        client.post("/users", headers=headers[username], json={"name": username})
+
+    return headers
+
+
+def test_round_results(client):
+    headers = login_players(client)
+
+    # No rounds yet.
+    response = client.get("/results", headers=headers["test_user"])
+    assert response.status_code == 404
+
+    # Play two rounds where both players vote for the first submission.
+    for round_idx in (1, 2):
+        client.post(
+            "/round", headers=headers["test_user"], json={"prompt": f"p{round_idx}"}
+        )
+        submission_ids = [
+            client.post(
+                "/submissions",
+                headers=headers[username],
+                json={"name": f"r{round_idx}-{username}"},
+            ).json()["id"]
+            for username in ("test_user", "test_user2")
+        ]
+        for username in ("test_user", "test_user2"):
+            client.post(
+                "/vote",
+                headers=headers[username],
+                json={"submission_id": submission_ids[0], "all_comments": {}},
+            )
+
+    response = client.get("/results", headers=headers["test_user"])
+    assert response.status_code == 200
+    assert response.json() == {
+        "round_id": 2,
+        "prompt": "p2",
+        "submissions": [
+            {
+                "submission_id": 3,
+                "movie_id": 3,
+                "movie_name": "r2-test_user",
+                "submitting_user": {"id": 1, "name": "test_user"},
+                "votes": 2,
+            },
+            {
+                "submission_id": 4,
+                "movie_id": 4,
+                "movie_name": "r2-test_user2",
+                "submitting_user": {"id": 2, "name": "test_user2"},
+                "votes": 0,
+            },
+        ],
+        "winners": [3],
+        "scores": [
+            {"user": {"id": 1, "name": "test_user"}, "score": 4},
+            {"user": {"id": 2, "name": "test_user2"}, "score": 0},
+        ],
+    }
+
+    # Running scores only include rounds up to the requested one.
+    response = client.get("/results/1", headers=headers["test_user"])
+    assert response.status_code == 200
+    assert response.json()["winners"] == [1]
+    assert response.json()["scores"][0]["score"] == 2
+
+
+class GenreMockIMDB(MockIMDB):
+    def get_by_name(name: str) -> dict[str, str]:
+        return {**MockIMDB.get_by_name(name), "genre": ["Drama", "Comedy"]}
+
+
+def test_stats(client, monkeypatch):
+    monkeypatch.setattr("imdbmovies.IMDB", lambda: GenreMockIMDB)
+    headers = login_players(client)
+
+    # Both rounds are won by `test_user`, who votes for themself.
+    for round_idx in (1, 2):
+        client.post(
+            "/round", headers=headers["test_user"], json={"prompt": f"p{round_idx}"}
+        )
+        submission_ids = [
+            client.post(
+                "/submissions",
+                headers=headers[username],
+                json={"name": f"Movie{idx}"},
+            ).json()["id"]
+            for idx, username in enumerate(("test_user", "test_user2"))
+        ]
+        for username in ("test_user", "test_user2"):
+            client.post(
+                "/vote",
+                headers=headers[username],
+                json={"submission_id": submission_ids[0], "all_comments": {}},
+            )
+
+    response = client.get("/stats/players", headers=headers["test_user"])
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "user": {"id": 1, "name": "test_user"},
+            "wins": 2,
+            "submissions": 2,
+            "votes_received": 4,
+            "votes_cast": 2,
+        },
+        {
+            "user": {"id": 2, "name": "test_user2"},
+            "wins": 0,
+            "submissions": 2,
+            "votes_received": 0,
+            "votes_cast": 2,
+        },
+    ]
+
+    response = client.get("/stats/movies?limit=1", headers=headers["test_user"])
+    assert response.json() == [
+        {"movie_id": 1, "name": "Movie0", "submissions": 2, "votes": 4}
+    ]
+
+    response = client.get("/stats/genres", headers=headers["test_user"])
+    assert {entry["genre"]: entry["votes"] for entry in response.json()} == {
+        "Drama": 4,
+        "Comedy": 4,
+    }
+
+    response = client.get("/stats/affinity", headers=headers["test_user"])
+    assert response.json() == [
+        {
+            "voter": {"id": 1, "name": "test_user"},
+            "submitter": {"id": 1, "name": "test_user"},
+            "votes": 2,
+        },
+        {
+            "voter": {"id": 2, "name": "test_user2"},
+            "submitter": {"id": 1, "name": "test_user"},
+            "votes": 2,
+        },
+    ]
+
+    # Rebuilding from scratch yields the same numbers.
+    manager = client.app.state.game_manager
+    with manager.sql_session() as session:
+        stats.rebuild(session, manager.round_archive)
+
+    response = client.get("/stats/players", headers=headers["test_user"])
+    assert [entry["wins"] for entry in response.json()] == [2, 0]
+    assert [entry["votes_received"] for entry in response.json()] == [4, 0]
+
+
+def test_stats_of_round_interrupted_by_new_round(client):
+    headers = login_players(client)
+
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p1"})
+    submission_ids = [
+        client.post(
+            "/submissions", headers=headers[username], json={"name": f"Movie{idx}"}
+        ).json()["id"]
+        for idx, username in enumerate(("test_user", "test_user2"))
+    ]
+    client.post(
+        "/vote",
+        headers=headers["test_user"],
+        json={"submission_id": submission_ids[1], "all_comments": {}},
+    )
+
+    # Starting the next round ends voting, the voted round is recorded.
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p2"})
+
+    with client.app.state.game_manager.sql_session() as session:
+        assert session.exec(select(models.StatsRound.round_id)).all() == [1]
+
+    response = client.get("/stats/players", headers=headers["test_user"])
+    assert {
+        entry["user"]["name"]: entry["votes_received"] for entry in response.json()
+    } == {"test_user": 0, "test_user2": 1}
+
+
+def test_stats_rebuild_during_voting(client):
+    headers = login_players(client)
+
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p1"})
+    submission_ids = [
+        client.post(
+            "/submissions", headers=headers[username], json={"name": f"Movie{idx}"}
+        ).json()["id"]
+        for idx, username in enumerate(("test_user", "test_user2"))
+    ]
+    client.post(
+        "/vote",
+        headers=headers["test_user"],
+        json={"submission_id": submission_ids[1], "all_comments": {}},
+    )
+
+    # The round still being voted on is left out, and recorded once it ends.
+    manager = client.app.state.game_manager
+    with manager.sql_session() as session:
+        stats.rebuild(session, manager.round_archive, manager.open_round_id())
+        assert session.exec(select(models.StatsRound.round_id)).all() == []
+
+    client.post(
+        "/vote",
+        headers=headers["test_user2"],
+        json={"submission_id": submission_ids[0], "all_comments": {}},
+    )
+    assert client.get("/state", headers=headers["test_user"]).json()["state"] == (
+        "OverviewState"
+    )
+
+    response = client.get("/stats/players", headers=headers["test_user"])
+    assert {
+        entry["user"]["name"]: (entry["wins"], entry["votes_received"])
+        for entry in response.json()
+    } == {"test_user": (1, 1), "test_user2": (1, 1)}
+
+
+def test_batch_comments(client):
+    headers = login_players(client)
+
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p"})
+    submission_id = client.post(
+        "/submissions", headers=headers["test_user"], json={"name": "Movie"}
+    ).json()["id"]
+
+    response = client.post(
+        "/comments/batch",
+        headers=headers["test_user2"],
+        json=[
+            {"submission_id": submission_id, "text": "first"},
+            {"submission_id": submission_id, "text": "second"},
+        ],
+    )
+    assert response.status_code == 200
+
+    round = client.get("/round", headers=headers["test_user"]).json()
+    comments = round["submissions"][0]["comments"]
+    assert [(c["author"]["name"], c["text"]) for c in comments] == [
+        ("test_user2", "first"),
+        ("test_user2", "second"),
+    ]
+
+
+def test_idempotent_submission(client):
+    headers = login_players(client)
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p"})
+
+    headers = {**headers["test_user"], "Idempotency-Key": "abc"}
+    first = client.post("/submissions/", headers=headers, json={"name": "Movie"})
+    replay = client.post("/submissions/", headers=headers, json={"name": "Movie"})
+
+    assert first.status_code == replay.status_code == 200
+    assert first.json() == replay.json()
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert len(client.get("/round", headers=headers).json()["submissions"]) == 1
+
+    # Reusing a key for a different payload is rejected.
+    response = client.post("/submissions/", headers=headers, json={"name": "Other"})
+    assert response.status_code == 422
+
+
+def test_idempotent_repeated_headers():
+    cookie_app = FastAPI()
+    cookie_app.add_middleware(idempotency.IdempotencyMiddleware)
+    cookie_app.state.idempotency_store = idempotency.IdempotencyStore(
+        max_entries=10, ttl_seconds=60
+    )
+
+    @cookie_app.post("/cookies")
+    def set_cookies(response: Response):
+        response.set_cookie("first", "1")
+        response.set_cookie("second", "2")
+
+    with TestClient(cookie_app) as cookie_client:
+        headers = {"Idempotency-Key": "abc"}
+        first = cookie_client.post("/cookies", headers=headers)
+        replay = cookie_client.post("/cookies", headers=headers)
+
+    # Both cookies are kept, in the first response as in the replay.
+    for response in (first, replay):
+        assert len(response.headers.get_list("set-cookie")) == 2
+
+
+def test_snapshot(client):
+    headers = login_players(client)
+
+    response = client.get("/snapshot", headers=headers["test_user"])
+    assert response.status_code == 200
+    assert response.json() == {
+        "version": 2,  # Both players joined.
+        "state": {
+            "state": "OverviewState",
+            "player_state": None,
+            "deadline": None,
+        },
+        "round": None,
+        "results": None,
+        "rounds": [],
+    }
+
+    for prompt in ("p1", "p2"):
+        client.post("/round", headers=headers["test_user"], json={"prompt": prompt})
+    client.post("/submissions", headers=headers["test_user"], json={"name": "Movie"})
+
+    response = client.get(
+        "/snapshot?history_limit=1", headers=headers["test_user"]
+    ).json()
+    assert response["state"] == {
+        "state": "SubmissionState",
+        "player_state": "closed",
+        "deadline": None,
+    }
+    assert response["round"]["prompt"] == "p2"
+    assert response["results"]["submissions"][0]["movie_name"] == "Movie"
+    assert [round["prompt"] for round in response["rounds"]] == ["p2"]
+    assert response["rounds"][0]["results"] == response["results"]
+
+    # Changes since the version of a snapshot are not in the snapshot yet.
+    delta = client.get(f"/round?since={response['version']}").json()
+    assert delta["submissions"] == []
+
+    response = client.get("/snapshot", headers=headers["test_user2"]).json()
+    assert response["state"] == {
+        "state": "SubmissionState",
+        "player_state": "open",
+        "deadline": None,
+    }
+    assert [round["prompt"] for round in response["rounds"]] == ["p2", "p1"]
+
+
+def test_metrics(client):
+    headers = login_players(client)
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p"})
+    client.post("/submissions/", headers=headers["test_user"], json={"name": "M"})
+    client.get("/state", headers=headers["test_user"])
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    lines = response.text.splitlines()
+    assert any(
+        line.startswith(
+            "http_request_duration_seconds_count"
+            '{method="GET",route="/state",status="200"}'
+        )
+        for line in lines
+    )
+    assert any(
+        line.startswith(
+            'http_request_sql_statements_count{method="POST",route="/submissions/"}'
+        )
+        for line in lines
+    )
+    assert any(
+        line.startswith('movie_cache_requests_total{result="miss"}') for line in lines
+    )
+    assert any(
+        line.startswith('game_state_transitions_total{state="SubmissionState"}')
+        for line in lines
+    )
+
+    # SQL statements are attributed to the request which issued them.
+    sql_sum = next(
+        line
+        for line in lines
+        if line.startswith(
+            'http_request_sql_statements_sum{method="POST",route="/submissions/"}'
+        )
+    )
+    assert float(sql_sum.split()[-1]) > 0
+
+
+def test_profiling(client, tmp_path):
+    headers = login_players(client)
+
+    response = client.post(
+        "/admin/profiling", headers=headers["test_user"], json={"route": "/rounds"}
+    )
+    assert response.status_code == 403
+
+    settings = get_settings_override(tmp_path)()
+    settings.admin_users = {"test_user"}
+    app.dependency_overrides[get_settings] = lambda: settings
+
+    response = client.post(
+        "/admin/profiling",
+        headers=headers["test_user"],
+        json={"route": "/rounds", "samples": 1, "interval_ms": 0.1},
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["route"] == "/rounds"
+
+    # Only the requested number of requests is profiled.
+    client.get("/rounds", headers=headers["test_user"])
+    client.get("/rounds", headers=headers["test_user"])
+
+    assert client.get("/admin/profiling", headers=headers["test_user"]).json() == []
+
+    profiles = client.get("/admin/profiles", headers=headers["test_user"]).json()
+    assert [(p["method"], p["route"], p["mode"]) for p in profiles][-1] == (
+        "GET",
+        "/rounds",
+        "sample",
+    )
+
+    response = client.get(
+        f"/admin/profiles/{profiles[-1]['id']}", headers=headers["test_user"]
+    )
+    assert response.status_code == 200
+    for line in response.text.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+
+
+def test_event_log(tmp_path):
+    # Restarts need the database on disk.
+    app.dependency_overrides[get_settings] = get_settings_override(
+        tmp_path, storage="disk"
+    )
+    with TestClient(app) as client:
+        headers = login_players(client)
+
+        client.post("/round", headers=headers["test_user"], json={"prompt": "p1"})
+        for username in headers:
+            client.post(
+                "/submissions",
+                headers=headers[username],
+                json={"name": f"{username} movie", "comment": "Great."},
+            )
+
+        response = client.get("/events", headers=headers["test_user"])
+        assert response.status_code == 200
+        assert [event["type"] for event in response.json()] == [
+            "player_joined",
+            "player_joined",
+            "round_created",
+            "state_transition",
+            "submission_added",
+            "submission_added",
+            "state_transition",
+        ]
+        assert response.json()[-1]["payload"] == {"state": "VotingState"}
+
+        response = client.get("/events?after=6", headers=headers["test_user"])
+        assert [event["id"] for event in response.json()] == [7]
+
+    # A restarted game resumes from the event log, using snapshots if present.
+    for interval in (100, 1):
+        manager = game_manager.GameManager(
+            get_settings_override(tmp_path, storage="disk")().model_copy(
+                update={"event_snapshot_interval": interval}
+            )
+        )
+        manager.setup_database()
+        assert manager.is_in_state(game_manager.VotingState)
+
+        manager.transition_to_state(game_manager.OverviewState)
+        manager.transition_to_state(game_manager.VotingState)
+        manager.close()
+
+
+def test_history_export_import(client, tmp_path):
+    headers = login_players(client)
+
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p1"})
+    for username in headers:
+        client.post(
+            "/submissions",
+            headers=headers[username],
+            json={"name": f"{username} movie", "comment": "Great."},
+        )
+    submissions = client.get("/round", headers=headers["test_user"]).json()[
+        "submissions"
+    ]
+    for username, submission in zip(headers, reversed(submissions)):
+        client.post(
+            "/vote",
+            headers=headers[username],
+            json={
+                "submission_id": submission["id"],
+                "all_comments": {submission["id"]: f"Vote by {username}."},
+            },
+        )
+    rounds = client.get("/rounds", headers=headers["test_user"]).json()
+
+    settings = get_settings_override(tmp_path)()
+    settings.admin_users = {"test_user"}
+    app.dependency_overrides[get_settings] = lambda: settings
+
+    response = client.get("/admin/export", headers=headers["test_user"])
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    export = response.text
+    assert [json.loads(line)["type"] for line in export.splitlines()] == [
+        "user",
+        "user",
+        "movie",
+        "movie",
+        "round",
+        "submission",
+        "submission",
+        "vote",
+        "vote",
+        "comment",
+        "comment",
+        "comment",
+        "comment",
+    ]
+
+    # Import into a fresh instance, without joining the game first.
+    import_settings = get_settings_override(tmp_path / "import")()
+    import_settings.datatbase_directory.mkdir()
+    import_settings.admin_users = {"test_user"}
+    app.dependency_overrides[get_settings] = lambda: import_settings
+
+    with TestClient(app) as import_client:
+        response = import_client.post(
+            "/admin/import",
+            headers=headers["test_user"],
+            files={"file": ("history.ndjson", export)},
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "user": 2,
+            "movie": 2,
+            "round": 1,
+            "submission": 2,
+            "vote": 2,
+            "comment": 4,
+        }
+
+        assert (
+            import_client.get("/rounds", headers=headers["test_user"]).json() == rounds
+        )
+        response = import_client.get("/stats/players", headers=headers["test_user"])
+        assert [player["votes_received"] for player in response.json()] == [1, 1]
+
+        # Importing twice would duplicate the history.
+        response = import_client.post(
+            "/admin/import",
+            headers=headers["test_user"],
+            files={"file": ("history.ndjson", export)},
+        )
+        assert response.status_code == 409
+
+
+def test_archive(tmp_path):
+    settings = get_settings_override(tmp_path)()
+    settings.archive_keep_rounds = 1
+    settings.archive_season_rounds = 2
+    settings.admin_users = {"test_user"}
+    app.dependency_overrides[get_settings] = lambda: settings
+
+    with TestClient(app) as client:
+        headers = login_players(client)
+
+        results = {}
+        for prompt in ("p1", "p2", "p3", "p4"):
+            client.post("/round", headers=headers["test_user"], json={"prompt": prompt})
+            for username in headers:
+                client.post(
+                    "/submissions",
+                    headers=headers[username],
+                    json={"name": f"{prompt} {username}"},
+                )
+
+            submissions = client.get("/round", headers=headers["test_user"]).json()[
+                "submissions"
+            ]
+            for username, submission in zip(headers, reversed(submissions)):
+                client.post(
+                    "/vote",
+                    headers=headers[username],
+                    json={"submission_id": submission["id"], "all_comments": {}},
+                )
+
+            result = client.get("/results", headers=headers["test_user"]).json()
+            results[result["round_id"]] = result
+
+            if prompt == "p2":
+                old_rounds = client.get("/rounds", headers=headers["test_user"]).json()
+
+        # Rounds 1 and 2 form a complete season and were archived after round 3.
+        assert len(list((tmp_path / "archive").iterdir())) == 1
+        with client.app.state.game_manager.sql_session() as session:
+            assert session.exec(select(func.count(models.Round.id))).one() == 2
+
+        rounds = client.get("/rounds", headers=headers["test_user"]).json()
+        assert [round["prompt"] for round in rounds] == ["p4", "p3", "p2", "p1"]
+        assert rounds[2:] == old_rounds
+
+        page = client.get("/rounds?offset=1&limit=2", headers=headers["test_user"])
+        assert [round["prompt"] for round in page.json()] == ["p3", "p2"]
+
+        for round_id, result in results.items():
+            response = client.get(f"/results/{round_id}", headers=headers["test_user"])
+            assert response.json() == result
+
+        # Running scores still include the archived rounds.
+        assert [score["score"] for score in results[4]["scores"]] == [4, 4]
+
+        # Stats rebuilt from scratch also include the archived rounds.
+        player_stats = client.get("/stats/players", headers=headers["test_user"])
+        manager = client.app.state.game_manager
+        with manager.sql_session() as session:
+            stats.rebuild(session, manager.round_archive)
+        response = client.get("/stats/players", headers=headers["test_user"])
+        assert response.json() == player_stats.json()
+        assert [player["submissions"] for player in response.json()] == [4, 4]
+
+        export = client.get("/admin/export", headers=headers["test_user"]).text
+        assert [json.loads(line)["type"] for line in export.splitlines()][-3:] == [
+            "archived_score",
+            "archived_score",
+            "archived_season",
+        ]
+
+    # The archive is part of the exported history.
+    import_settings = get_settings_override(tmp_path / "import")()
+    import_settings.datatbase_directory.mkdir()
+    import_settings.admin_users = {"test_user"}
+    app.dependency_overrides[get_settings] = lambda: import_settings
+
+    with TestClient(app) as import_client:
+        response = import_client.post(
+            "/admin/import",
+            headers=headers["test_user"],
+            files={"file": ("history.ndjson", export)},
+        )
+        assert response.json()["archived_season"] == 1
+
+        response = import_client.get("/rounds", headers=headers["test_user"])
+        assert response.json() == rounds
+        response = import_client.get("/stats/players", headers=headers["test_user"])
+        assert response.json() == player_stats.json()
+        response = import_client.get("/results/4", headers=headers["test_user"])
+        assert response.json() == results[4]
+
+
+def test_search(client):
+    headers = login_players(client)
+
+    client.post(
+        "/round", headers=headers["test_user"], json={"prompt": "Best heist movie"}
+    )
+    client.post(
+        "/submissions",
+        headers=headers["test_user"],
+        json={"name": "Heat", "comment": "The bank robbery scene is unmatched."},
+    )
+    submission_id = client.get("/round", headers=headers["test_user"]).json()[
+        "submissions"
+    ][0]["id"]
+    client.post(
+        "/comments",
+        headers=headers["test_user2"],
+        json={"submission_id": submission_id, "text": "A perfect heist!"},
+    )
+
+    response = client.get("/search?q=heist", headers=headers["test_user"])
+    assert response.status_code == 200
+    hits = response.json()
+    assert {(hit["field"], hit["round_id"], hit["submission_id"]) for hit in hits} == {
+        ("prompt", 1, None),
+        ("comment", 1, submission_id),
+    }
+    prompt_hit = next(hit for hit in hits if hit["field"] == "prompt")
+    assert prompt_hit["highlights"] == [
+        {"text": "Best ", "match": False},
+        {"text": "heist", "match": True},
+        {"text": " movie", "match": False},
+    ]
+
+    # The last word matches as a prefix, all words must match.
+    hits = client.get("/search?q=bank robb", headers=headers["test_user"]).json()
+    assert [hit["submission_id"] for hit in hits] == [submission_id]
+    assert client.get("/search?q=bank heist", headers=headers["test_user"]).json() == []
+
+    response = client.get(
+        "/search?q=heist&limit=1&offset=1", headers=headers["test_user"]
+    )
+    assert len(response.json()) == 1
+
+    # Query syntax is not interpreted.
+    for query in ('"', "heist OR", "NEAR(", "*"):
+        response = client.get(
+            "/search", params={"q": query}, headers=headers["test_user"]
+        )
+        assert response.status_code == 200
+
+
+def test_frontend_assets(tmp_path):
+    script = "console.log('MovieHive');\n" * 100
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "assets" / "index-4f2a9c.js").write_text(script)
+    frontend.compress(tmp_path)
+
+    static_app = FastAPI()
+    static_app.mount(
+        "/assets",
+        frontend.PrecompressedStaticFiles(
+            directory=tmp_path / "assets", cache_control=frontend.IMMUTABLE
+        ),
+    )
+
+    with TestClient(static_app) as static_client:
+        response = static_client.get(
+            "/assets/index-4f2a9c.js", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"] == frontend.IMMUTABLE
+        assert response.headers["content-type"].startswith("text/javascript")
+        assert int(response.headers["content-length"]) < len(script)
+        assert response.text == script
+
+        response = static_client.get(
+            "/assets/index-4f2a9c.js",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": response.headers["etag"],
+            },
+        )
+        assert response.status_code == 304
+
+        response = static_client.get(
+            "/assets/index-4f2a9c.js", headers={"Accept-Encoding": "gzip;q=0"}
+        )
+        assert "content-encoding" not in response.headers
+        assert response.text == script
+
+
+def test_dev_server_proxies_all_routes():
+    api_paths_file = pathlib.Path(__file__).parents[2] / "frontend" / "apiPaths.json"
+    api_paths = set(json.loads(api_paths_file.read_text()))
+
+    # Every API route is forwarded by the dev server.
+    route_paths = {"/" + path.split("/")[1] for path in app.openapi()["paths"]}
+    assert route_paths
+    assert route_paths <= api_paths
+
+
+def test_schema_migration(tmp_path):
+    settings = get_settings_override(tmp_path, storage="disk")()
+
+    manager = game_manager.GameManager(settings)
+    manager.setup_database()
+    # Movie names were not unique before, duplicates need to be merged.
+    with manager.engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_movie_name")
+        connection.exec_driver_sql("DROP INDEX ix_movie_requested_name")
+    with manager.sql_session() as session:
+        user = models.User(name="test_user")
+        round = models.Round(prompt="p1")
+        movies = [
+            models.Movie(
+                name="Movie",
+                requested_name=requested_name,
+                poster_url="",
+                description="",
+                genre="",
+                release_date="",
+                actors="",
+                directors="",
+            )
+            for requested_name in ("Movie", "movie")
+        ]
+        # Prefetched movies were stored without being submitted.
+        prefetched = models.Movie.model_validate(
+            {**movies[0].model_dump(), "name": "Mov", "requested_name": "Mov"}
+        )
+        movies.append(prefetched)
+        session.add_all([user, round, *movies])
+        session.flush()
+        submission = models.Submission(
+            round_id=round.id,
+            submitting_user_id=user.id,
+            movie_id=movies[1].id,
+            vote_count=1,
+        )
+        user.voted_submissions.append(submission)
+        movie_id = movies[0].id
+        session.commit()
+
+    # Turn it into a database from before schema versioning.
+    with manager.engine.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE submission DROP COLUMN vote_count")
+        connection.exec_driver_sql("PRAGMA user_version = 0")
+    manager.close()
+
+    manager = game_manager.GameManager(settings)
+    manager.setup_database()
+    with manager.sql_session() as session:
+        assert session.exec(select(models.Submission.vote_count)).all() == [1]
+        assert session.exec(select(models.Movie.id)).all() == [movie_id]
+        assert session.exec(select(models.Submission.movie_id)).all() == [movie_id]
+        indexes = session.connection().exec_driver_sql("PRAGMA index_list(movie)")
+        assert "ix_movie_requested_name" in {row[1] for row in indexes}
+        assert (
+            session.connection().exec_driver_sql("PRAGMA user_version").scalar()
+            == game_manager.SCHEMA_VERSION
+        )
+    manager.close()
+
+
+def wait_for_state(client, headers, state: str, timeout: float = 5) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = client.get("/state", headers=headers).json()
+        if response["state"] == state:
+            return response
+        time.sleep(0.05)
+
+    raise AssertionError(f"Game did not reach {state}, it is in {response}")
+
+
+def test_idle_players_and_deadlines(tmp_path):
+    settings = get_settings_override(tmp_path)()
+    settings.presence_timeout_seconds = 0.5
+    settings.voting_deadline_seconds = 0.5
+    app.dependency_overrides[get_settings] = lambda: settings
+
+    with TestClient(app) as client:
+        headers = login_players(client)
+
+        client.post("/round", headers=headers["test_user"], json={"prompt": "p1"})
+        client.post(
+            "/submissions", headers=headers["test_user"], json={"name": "Movie"}
+        )
+        response = client.get("/state", headers=headers["test_user"]).json()
+        assert response["state"] == "SubmissionState"
+        assert response["deadline"] is None
+
+        # Only the active player is waited for once test_user2 goes idle.
+        response = wait_for_state(client, headers["test_user"], "VotingState")
+        assert response["deadline"] is not None
+
+        # Nobody votes, the voting deadline ends the round.
+        wait_for_state(client, headers["test_user"], "OverviewState")
+        results = client.get("/results", headers=headers["test_user"]).json()
+        assert results["winners"] == []
+
+
+def test_round_delta(client):
+    headers = login_players(client)
+
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p1"})
+    client.post("/submissions", headers=headers["test_user"], json={"name": "Movie"})
+
+    # Clients without a version get the full round.
+    delta = client.get("/round?since=0").json()
+    assert delta["round"]["prompt"] == "p1"
+    assert len(delta["round"]["submissions"]) == 1
+    version = delta["version"]
+
+    response = client.get(f"/round?since={version}")
+    assert response.json() == {
+        "version": version,
+        "round": None,
+        "submissions": [],
+        "votes": [],
+        "comments": [],
+    }
+
+    client.post(
+        "/submissions",
+        headers=headers["test_user2"],
+        json={"name": "Other movie", "comment": "Watch it."},
+    )
+    delta = client.get(f"/round?since={version}").json()
+    assert delta["round"] is None
+    assert [sub["movie"]["name"] for sub in delta["submissions"]] == ["Other movie"]
+    assert delta["submissions"][0]["comments"][0]["text"] == "Watch it."
+    assert delta["comments"] == []
+    version = delta["version"]
+
+    submissions = client.get("/round").json()["submissions"]
+    client.post(
+        "/vote",
+        headers=headers["test_user"],
+        json={
+            "submission_id": submissions[1]["id"],
+            "all_comments": {submissions[0]["id"]: "Mine is better."},
+        },
+    )
+    delta = client.get(f"/round?since={version}").json()
+    assert delta["submissions"] == []
+    assert delta["votes"] == [
+        {
+            "submission_id": submissions[1]["id"],
+            "user": {
+                "id": submissions[0]["submitting_user"]["id"],
+                "name": "test_user",
+            },
+        }
+    ]
+    assert [
+        (comment["submission_id"], comment["text"]) for comment in delta["comments"]
+    ] == [(submissions[0]["id"], "Mine is better.")]
+    assert delta["comments"][0]["author"]["name"] == "test_user"
+    version = delta["version"]
+
+    # A new round needs a full reload.
+    client.post(
+        "/vote",
+        headers=headers["test_user2"],
+        json={"submission_id": submissions[0]["id"], "all_comments": {}},
+    )
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p2"})
+    delta = client.get(f"/round?since={version}").json()
+    assert delta["round"]["prompt"] == "p2"
+    assert delta["version"] > version
+
+
+class SlowMockIMDB(MockIMDB):
+    fetches = 0
+    lock = threading.Lock()
+
+    def get_by_name(name: str) -> dict[str, str]:
+        with SlowMockIMDB.lock:
+            SlowMockIMDB.fetches += 1
+        time.sleep(0.2)
+        return MockIMDB.get_by_name("Heat")
+
+
+def test_concurrent_new_movie_submissions(tmp_path, monkeypatch):
+    monkeypatch.setattr("imdbmovies.IMDB", lambda: SlowMockIMDB)
+
+    manager = game_manager.GameManager(get_settings_override(tmp_path)())
+    manager.setup_database()
+
+    usernames = [f"player{idx}" for idx in range(6)]
+    for username in usernames:
+        manager.add_player(models.UserCreate(name=username))
+    manager.create_new_round(models.RoundCreate(prompt="p1"))
+
+    # Differently typed titles of the same movie are fetched only once.
+    titles = ["Heat", "heat", " HEAT ", "Heat", "heat", "Heat"]
+    barrier = threading.Barrier(len(usernames))
+
+    def submit(username, title):
+        barrier.wait()
+        submission = models.SubmissionCreate(name=title)
+        return manager.add_submission(username, submission).movie.id
+
+    with concurrent.futures.ThreadPoolExecutor(len(usernames)) as executor:
+        movie_ids = list(executor.map(submit, usernames, titles))
+
+    assert SlowMockIMDB.fetches == 1
+    assert len(set(movie_ids)) == 1
+    with manager.sql_session() as session:
+        assert session.exec(select(func.count(models.Movie.id))).one() == 1
+
+        # The unique constraint backs this up across processes.
+        session.add(
+            models.Movie(
+                name="Heat",
+                requested_name="heat",
+                poster_url="",
+                description="",
+                genre="",
+                release_date="",
+                actors="",
+                directors="",
+            )
+        )
+        with pytest.raises(IntegrityError):
+            session.commit()
+    manager.close()
+
+
+def test_write_queue(tmp_path):
+    settings = get_settings_override(tmp_path)().model_copy(
+        update={"write_queue_max_batch": 4}
+    )
+    manager = game_manager.GameManager(settings)
+    manager.setup_database()
+
+    usernames = [f"player{idx}" for idx in range(10)]
+    for username in usernames:
+        manager.add_player(models.UserCreate(name=username))
+    manager.create_new_round(models.RoundCreate(prompt="p1"))
+    submission_id = manager.add_submission(
+        usernames[0], models.SubmissionCreate(name="Movie")
+    ).id
+
+    # A failing write does not affect the others committed with it.
+    barrier = threading.Barrier(len(usernames))
+
+    def vote(username):
+        barrier.wait()
+        manager.add_vote(
+            username,
+            models.VoteCreate(
+                submission_id=submission_id if username != "player3" else 0,
+                all_comments={submission_id: f"comment by {username}"},
+            ),
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(len(usernames)) as executor:
+        futures = {username: executor.submit(vote, username) for username in usernames}
+
+    with pytest.raises(HTTPException) as error:
+        futures.pop("player3").result()
+    assert error.value.status_code == 404
+    for future in futures.values():
+        future.result()
+
+    with manager.sql_session() as session:
+        submission = session.get(models.Submission, submission_id)
+        assert submission.vote_count == len(usernames) - 1
+        assert len(submission.comments) == len(usernames) - 1
+
+    manager.close()
+
+
+def test_spectators(client):
+    headers = login_players(client)
+
+    response = client.get("/spectate")
+    assert response.status_code == 200
+    assert response.json()["state"]["state"] == "OverviewState"
+    assert response.json()["round"] is None
+    etag = response.headers["etag"]
+
+    # Unchanged snapshots are not sent again.
+    response = client.get("/spectate", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p1"})
+
+    deadline = time.monotonic() + 5
+    while (response := client.get("/spectate")).json()["round"] is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    client.post("/submissions", headers=headers["test_user"], json={"name": "Movie"})
+    while not (response := client.get("/spectate")).json()["round"]["submissions"]:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    snapshot = response.json()
+    assert snapshot["state"]["state"] == "SubmissionState"
+    assert snapshot["round"]["prompt"] == "p1"
+    assert response.headers["etag"] == f'"{snapshot["version"]}"'
+
+    # All spectators share the same serialized snapshot.
+    serialized = metrics.spectator_snapshots.value()
+    for _ in range(10):
+        assert client.get("/spectate").content == response.content
+    assert metrics.spectator_snapshots.value() == serialized
+
+
+def test_spectator_stream(tmp_path):
+    manager = game_manager.GameManager(get_settings_override(tmp_path)())
+    manager.setup_database()
+    manager.add_player(models.UserCreate(name="test_user"))
+
+    def parse(event: bytes) -> dict:
+        id_line, data_line = event.decode().strip().splitlines()
+        snapshot = json.loads(data_line.removeprefix("data: "))
+        assert id_line == f"id: {snapshot['version']}"
+        return snapshot
+
+    async def watch() -> list[dict]:
+        spectators = broadcast.SpectatorBroadcast(manager, poll_interval=0.01)
+        task = asyncio.create_task(spectators.run())
+
+        # Streams never end on their own, so read a fixed number of events.
+        events = spectators.subscribe()
+        try:
+            snapshots = [parse(await asyncio.wait_for(anext(events), 5))]
+            await asyncio.to_thread(
+                manager.create_new_round, models.RoundCreate(prompt="p1")
+            )
+            while snapshots[-1]["state"]["state"] != "SubmissionState":
+                snapshots.append(parse(await asyncio.wait_for(anext(events), 5)))
+        finally:
+            await events.aclose()
+            task.cancel()
+
+        assert spectators._streams == 0
+        return snapshots
+
+    snapshots = asyncio.run(watch())
+    assert snapshots[0]["round"] is None
+    assert snapshots[-1]["round"]["prompt"] == "p1"
+    assert [snapshot["version"] for snapshot in snapshots] == sorted(
+        {snapshot["version"] for snapshot in snapshots}
+    )
+    manager.close()
+
+
+def test_admission_control(tmp_path):
+    settings = get_settings_override(tmp_path)()
+    settings.rate_limit_per_second = 0.5
+    settings.rate_limit_burst = 3
+    app.dependency_overrides[get_settings] = lambda: settings
+
+    with TestClient(app) as client:
+        headers = login_players(client)
+
+        statuses = [
+            client.get("/state", headers=headers["test_user"]).status_code
+            for _ in range(4)
+        ]
+        assert statuses[-1] == 429
+        response = client.get("/state", headers=headers["test_user"])
+        assert response.status_code == 429
+        assert 1 <= int(response.headers["Retry-After"]) <= 2
+
+        # Every client has a bucket of its own.
+        response = client.get("/state", headers=headers["test_user2"])
+        assert response.status_code == 200
+        assert client.get("/metrics").status_code == 200
+
+        # Made up tokens all count against the address of the client.
+        statuses = [
+            client.get(
+                "/state", headers={"Authorization": f"Bearer made-up-{idx}"}
+            ).status_code
+            for idx in range(4)
+        ]
+        assert statuses[-1] == 429
+
+    # Under overload, reads are shed before writes.
+    controller = admission.AdmissionController(
+        rate=None, burst=1, max_inflight=4, read_fraction=0.5
+    )
+    assert controller.admit("a", write=False) is None
+    assert controller.admit("b", write=False) is None
+    assert controller.admit("c", write=False) == ("overload", 1.0)
+    assert controller.admit("c", write=True) is None
+    assert controller.admit("d", write=True) is None
+    assert controller.admit("e", write=True) == ("overload", 1.0)
+
+    controller.release()
+    assert controller.admit("e", write=True) is None
+
+
+def test_memory_storage_snapshot(tmp_path):
+    settings = get_settings_override(tmp_path)().model_copy(
+        update={"memory_snapshot_path": tmp_path / "snapshot.db"}
+    )
+
+    manager = game_manager.GameManager(settings)
+    manager.setup_database()
+    manager.add_player(models.UserCreate(name="test_user"))
+    manager.create_new_round(models.RoundCreate(prompt="p1"))
+    assert list(tmp_path.iterdir()) == []
+    manager.close()
+
+    # Games are resumed from the snapshot written on shutdown.
+    manager = game_manager.GameManager(settings)
+    manager.setup_database()
+    assert manager.is_in_state(game_manager.SubmissionState)
+    assert manager.get_current_round().prompt == "p1"
+    manager.close()
+
+    # Without a snapshot, every game starts empty.
+    manager = game_manager.GameManager(get_settings_override(tmp_path)())
+    manager.setup_database()
+    assert manager.get_all_rounds() == []
+    manager.close()
+
+
+def test_database_maintenance(tmp_path):
+    settings = get_settings_override(tmp_path, storage="disk")().model_copy(
+        update={"maintenance_idle_seconds": 0}
+    )
+
+    manager = game_manager.GameManager(settings)
+    manager.setup_database()
+    with manager.sql_session() as session:
+        for idx in range(500):
+            session.add(
+                models.Movie(
+                    name=f"movie{idx}",
+                    requested_name=f"movie{idx}",
+                    poster_url="",
+                    description="x" * 1000,
+                    genre="",
+                    release_date="",
+                    actors="",
+                    directors="",
+                )
+            )
+        session.commit()
+        for movie in session.exec(select(models.Movie)):
+            session.delete(movie)
+        session.commit()
+
+    # Idle in the overview, maintenance is due right away.
+    assert manager.next_wakeup() <= time.monotonic()
+    manager.check_deadline()
+    report = manager.last_maintenance_report
+    assert report.reclaimed_bytes > 0
+    assert report.analyzed
+    assert report.integrity == "ok"
+
+    # Later runs only free pages incrementally and skip the integrity check.
+    report = manager.run_maintenance()
+    assert report.reclaimed_bytes == 0
+    assert not report.analyzed
+    assert report.integrity is None
+
+    # Not again before the interval passed, nor during a round.
+    assert manager.next_wakeup() > time.monotonic() + 60
+    manager.create_new_round(models.RoundCreate(prompt="p1"))
+    assert manager.maintenance_due() is None
+    with pytest.raises(HTTPException) as error:
+        manager.run_maintenance()
+    assert error.value.status_code == 409
+    manager.close()
+
+
+def test_database_maintenance_route(client, tmp_path):
+    headers = login_players(client)
+    response = client.post("/admin/maintenance", headers=headers["test_user"])
+    assert response.status_code == 403
+
+    settings = get_settings_override(tmp_path)()
+    settings.admin_users = {"test_user"}
+    app.dependency_overrides[get_settings] = lambda: settings
+
+    response = client.get("/admin/maintenance", headers=headers["test_user"])
+    assert response.json() is None
+
+    report = client.post("/admin/maintenance", headers=headers["test_user"]).json()
+    assert report["integrity"] == "ok"
+    # In-memory databases have no write-ahead log.
+    assert report["checkpointed_frames"] is None
+
+    response = client.get("/admin/maintenance", headers=headers["test_user"])
+    assert response.json() == report
+
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p1"})
+    response = client.post("/admin/maintenance", headers=headers["test_user"])
+    assert response.status_code == 409
+
+
+class RecordingMockIMDB(MockIMDB):
+    names = []
+    release = threading.Event()
+
+    def get_by_name(name: str) -> dict[str, str]:
+        RecordingMockIMDB.names.append(name)
+        RecordingMockIMDB.release.wait(5)
+        return MockIMDB.get_by_name(name)
+
+
+def test_movie_prefetch(client, tmp_path, monkeypatch):
+    monkeypatch.setattr("imdbmovies.IMDB", lambda: RecordingMockIMDB)
+    settings = get_settings_override(tmp_path)().model_copy(
+        update={"prefetch_max_concurrency": 1}
+    )
+
+    manager = game_manager.GameManager(settings)
+    manager.setup_database()
+    # Prefetches waiting past the submissions are skipped.
+    manager._prefetch_movie("Heat")
+    manager.create_new_round(models.RoundCreate(prompt="p1"))
+    for username in ["player1", "player2"]:
+        manager.add_player(models.UserCreate(name=username))
+
+    # Titles too short to mean much are not fetched at all.
+    manager.prefetch_movie("player1", "Al")
+
+    # While the single slot is taken, a newer title replaces the waiting one.
+    manager.prefetch_movie("player1", "Alien")
+    manager.prefetch_movie("player2", "The Thi")
+    manager.prefetch_movie("player2", "The Thing")
+    RecordingMockIMDB.release.set()
+    for _ in range(100):
+        if "the thing" in manager._prefetched:
+            break
+        time.sleep(0.05)
+
+    assert RecordingMockIMDB.names == ["Alien", "The Thing"]
+
+    # Prefetched movies are only stored once submitted, without fetching again.
+    with manager.sql_session() as session:
+        assert session.exec(select(models.Movie)).all() == []
+    submission = models.SubmissionCreate(name="the thing")
+    movie = manager.add_submission("player2", submission).movie
+    assert (movie.name, movie.requested_name) == ("The Thing", "the thing")
+    assert RecordingMockIMDB.names == ["Alien", "The Thing"]
+    with manager.sql_session() as session:
+        assert len(session.exec(select(models.Movie)).all()) == 1
+    manager.close()
+
+    headers = login_players(client)
+    client.post("/round", headers=headers["test_user"], json={"prompt": "p1"})
+    response = client.post(
+        "/submissions/prefetch", headers=headers["test_user"], json={"name": "Heat"}
+    )
+    assert response.status_code == 202
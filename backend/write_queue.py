@@ -0,0 +1,114 @@
+"""Group commits for SQLite.
+
+SQLite allows a single writer at a time, so concurrent requests committing on
+their own queue up behind each other's fsync. Instead, one writer thread takes
+all writes which queued up in the meantime and commits them together. Every
+write runs in its own savepoint, so a failing write does not affect the others
+in its batch.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_STOP = object()
+
+
+def enable_savepoints(engine: Engine):
+    # The sqlite3 module only begins transactions before DML, which breaks
+    # savepoints. Begin them ourselves, taking the write lock right away.
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def on_begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+class WriteQueue:
+    """Runs `function(session)` for every write on a single writer thread."""
+
+    def __init__(self, engine: Engine, max_batch: int):
+        self.engine = engine
+        self.max_batch = max_batch
+
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._run, name="write-queue", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, function: Callable[[Session], T]) -> T:
+        """Blocks until the write is committed and returns its result.
+
+        The session is closed after the commit, so results should not be
+        database objects.
+        """
+        future = Future()
+        self._queue.put((function, future))
+        return future.result()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _next_batch(self) -> list | None:
+        item = self._queue.get()
+        if item is _STOP:
+            return None
+
+        batch = [item]
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while (batch := self._next_batch()) is not None:
+            start = time.perf_counter()
+            self._commit(batch)
+            metrics.write_queue_batch_size.observe(len(batch))
+            metrics.write_queue_commit_duration.observe(time.perf_counter() - start)
+
+    def _commit(self, batch: list[tuple[Callable[[Session], T], Future]]):
+        results = []
+        try:
+            with Session(self.engine) as session:
+                for function, future in batch:
+                    try:
+                        with session.begin_nested():
+                            results.append((future, function(session)))
+                    except Exception as error:
+                        future.set_exception(error)
+                session.commit()
+        except Exception as error:
+            logger.exception("Group commit of %s writes failed", len(batch))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for future, result in results:
+            future.set_result(result)
@@ -5,44 +5,126 @@ import LoginScreen from "./LoginScreen.jsx";
 import Container from "./Container.jsx";
 import SubmissionView from "./SubmissionView.jsx";
 import VotingView from "./VotingView.jsx";
-import OverView from "./OverView.jsx";
+import OverView, { HISTORY_PAGE_SIZE } from "./OverView.jsx";
+import { applyRoundDelta } from "./roundDelta.js";
 
+// Players are considered idle after 60 seconds without a heartbeat.
+const HEARTBEAT_INTERVAL_MS = 15000;
+const ROUND_SYNC_INTERVAL_MS = 3000;
 
 export default function App() {
-  const [gameState, setGameState] = useState({});
+  const [snapshot, setSnapshot] = useState({ state: {}, round: null, results: null, rounds: [] });
   const [userInfo, setUserInfo] = useState(null);
 
-  const setupGame = async (userInfo) => {
-    await fetch(`http://localhost:8000/users/`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-        "Authorization": `Bearer ${userInfo.token.access_token}`,
-      },
-      body: JSON.stringify({
-        name: userInfo.username,
-      })
-    })
+  // Version of the open round shown, changes after it are synced as deltas.
+  const roundVersionRef = useRef(0);
 
+  const loadSnapshot = async (userInfo) => {
     try {
-      const response = await fetch("http://localhost:8000/state/", {
+      const response = await fetch(`/snapshot?history_limit=${HISTORY_PAGE_SIZE}`, {
         method: "GET",
         headers: {
           "Authorization": `Bearer ${userInfo.token.access_token}`,
         },
       })
       const result = await response.json();
-      setGameState(result)
+      roundVersionRef.current = result.version;
+      setSnapshot(result)
     } catch (error) {
       console.error("Error game state:", error);
     }
   }
 
+  const setupGame = async (userInfo) => {
+    await fetch(`/users/`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        "Authorization": `Bearer ${userInfo.token.access_token}`,
+      },
+      body: JSON.stringify({
+        name: userInfo.username,
+      })
+    })
+
+    await loadSnapshot(userInfo);
+  }
+
   const onLogin = async (userInfo) => {
     setUserInfo(userInfo);
     setupGame(userInfo);
   }
 
+  // Polling the state doubles as presence heartbeat, and picks up rounds
+  // which advanced because of a deadline.
+  const gameStateRef = useRef(snapshot.state);
+  gameStateRef.current = snapshot.state;
+
+  useEffect(() => {
+    if (userInfo === null) {
+      return;
+    }
+
+    const interval = setInterval(async () => {
+      try {
+        const response = await fetch("/state", {
+          method: "GET",
+          headers: {
+            "Authorization": `Bearer ${userInfo.token.access_token}`,
+          },
+        })
+        // Rejected polls (e.g. 429 under load) are simply retried next time.
+        if (!response.ok) {
+          return;
+        }
+        const gameState = await response.json();
+        if (gameState.state !== gameStateRef.current.state) {
+          loadSnapshot(userInfo);
+        }
+      } catch (error) {
+        console.error("Error polling game state:", error);
+      }
+    }, HEARTBEAT_INTERVAL_MS);
+
+    return () => clearInterval(interval);
+  }, [userInfo]);
+
+  // Keep an open round up to date, only transferring what changed.
+  useEffect(() => {
+    if (userInfo === null || !["SubmissionState", "VotingState"].includes(snapshot.state.state)) {
+      return;
+    }
+
+    const interval = setInterval(async () => {
+      try {
+        const since = roundVersionRef.current;
+        const response = await fetch(`/round?since=${since}`);
+        if (!response.ok) {
+          return;
+        }
+        const delta = await response.json();
+        // A snapshot replaced the round meanwhile, the delta is outdated.
+        if (roundVersionRef.current !== since) {
+          return;
+        }
+        roundVersionRef.current = delta.version;
+        setSnapshot(snapshot => ({ ...snapshot, round: applyRoundDelta(snapshot.round, delta) }));
+      } catch (error) {
+        console.error("Error syncing round:", error);
+      }
+    }, ROUND_SYNC_INTERVAL_MS);
+
+    return () => clearInterval(interval);
+  }, [userInfo, snapshot.state.state]);
+
+  // Show the new state right away, then reload the rest of the snapshot.
+  const setGameState = (gameState) => {
+    if (gameState) {
+      setSnapshot(snapshot => ({ ...snapshot, state: gameState }));
+    }
+    loadSnapshot(userInfo);
+  }
+
   if (userInfo === null) {
     return <LoginScreen onLogin={onLogin} />
   }
@@ -53,12 +135,13 @@ export default function App() {
     </h1>
   );
 
+  const gameState = snapshot.state;
   if (gameState.state === "SubmissionState") {
-    container = <Container><SubmissionView gameState={gameState} setGameState={setGameState} /></Container>;
+    container = <Container round={snapshot.round}><SubmissionView gameState={gameState} setGameState={setGameState} /></Container>;
   } else if (gameState.state === "VotingState") {
-    container = <Container><VotingView gameState={gameState} setGameState={setGameState} /></Container>;
+    container = <Container round={snapshot.round}><VotingView gameState={gameState} setGameState={setGameState} round={snapshot.round} /></Container>;
   } else if (gameState.state === "OverviewState") {
-    container = <OverView setGameState={setGameState} />;
+    container = <OverView setGameState={setGameState} rounds={snapshot.rounds} results={snapshot.results} />;
   }
   return <UserContext.Provider value={userInfo} >{container}</UserContext.Provider >
 }
\ No newline at end of file
@@ -1,27 +1,12 @@
-import { useRef, useState, useEffect, useContext } from 'react';
+import { useContext } from 'react';
 import { UserContext } from './UserContext.js';
 
 import styles from "./Container.module.css";
 
 
-export default function Container({ children }) {
-  const [prompt, setPrompt] = useState([])
+export default function Container({ round, children }) {
   const userInfo = useContext(UserContext);
-
-  useEffect(() => {
-    const loadState = async () => {
-      try {
-        const response = await fetch("http://localhost:8000/round/", {
-          method: "GET",
-        })
-        const result = await response.json();
-        setPrompt(result.prompt)
-      } catch (error) {
-        console.error("Error game state:", error);
-      }
-    }
-    loadState()
-  }, []);
+  const prompt = round ? round.prompt : "";
 
   return (
     <div className={styles.container}>
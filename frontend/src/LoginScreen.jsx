@@ -16,7 +16,7 @@ export default function LoginScreen({ onLogin }) {
     data.append("password", inputRefs.current.password.value);
 
     try {
-      const response = await fetch("http://localhost:8000/token/", {
+      const response = await fetch("/token/", {
         method: "POST",
         body: data,
       });
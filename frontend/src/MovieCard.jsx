@@ -8,7 +8,7 @@ function PersonCard({ personData }) {
 
   return (
     <div className={styles.personCard}>
-      <img className={styles.personPicture} src={picture_url} />
+      <img className={styles.personPicture} src={picture_url} loading="lazy" />
       {name}
     </div>
   );
@@ -16,7 +16,7 @@ function PersonCard({ personData }) {
 
 export default function MovieCard({ movieData }) {
   return (<div className={styles.movieCard}>
-    <img className={styles.moviePoster} src={movieData.poster_url} />
+    <img className={styles.moviePoster} src={movieData.poster_url} loading="lazy" />
     <div className={styles.movieInfo}>
       <h3>{movieData.name}</h3>
       <span>{movieData.release_date.split("-")[0]} - {movieData.directors.split(";").map((data, i) => data.split(",")[0]).join(", ")}</span>
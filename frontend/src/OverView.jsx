@@ -1,6 +1,7 @@
-import { useState, useEffect, useContext, useRef } from "react";
+import { useState, useEffect, useCallback, useContext, useRef } from "react";
 
 import ResultView from "./ResultView.jsx";
+import VirtualList from "./VirtualList.jsx";
 import { UserContext } from './UserContext.js';
 
 import commonStyles from "./CommonStyles.module.css";
@@ -22,7 +23,7 @@ function PromptSubmission({ setGameState }) {
     };
 
     try {
-      const response = await fetch("http://localhost:8000/round/", {
+      const response = await fetch("/round/", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -52,27 +53,73 @@ function PromptSubmission({ setGameState }) {
   );
 }
 
-export default function OverView({ setGameState }) {
-  const [results, setResults] = useState([]);
+function Standings({ results }) {
+  const scores = results ? results.scores : [];
+
+  if (scores.length === 0) {
+    return null;
+  }
+
+  return (
+    <div className={containerStyles.card}>
+      <p className={containerStyles.title}>Standings</p>
+      {scores.map(entry => <div key={entry.user.id}><b>{entry.user.name}</b>: {entry.score}</div>)}
+    </div>
+  );
+}
+
+// The snapshot contains the newest rounds, older ones are loaded on demand.
+export const HISTORY_PAGE_SIZE = 10;
+
+// Height of a round with collapsed submissions, until it is measured.
+const ESTIMATED_ROUND_HEIGHT_PX = 400;
+
+export default function OverView({ setGameState, rounds, results }) {
   const userInfo = useContext(UserContext);
+  const [olderRounds, setOlderRounds] = useState([]);
+  const [hasMore, setHasMore] = useState(rounds.length >= HISTORY_PAGE_SIZE);
+  const loading = useRef(false);
+  // Kept here, as rounds scrolled out of view are unmounted.
+  const [expanded, setExpanded] = useState(new Set());
 
+  const toggleExpanded = useCallback(submissionId => {
+    setExpanded(expanded => {
+      const next = new Set(expanded);
+      next.has(submissionId) ? next.delete(submissionId) : next.add(submissionId);
+      return next;
+    });
+  }, []);
+
+  // A new snapshot shifts all offsets, start over from it.
   useEffect(() => {
-    const loadState = async () => {
-      try {
-        const response = await fetch("http://localhost:8000/rounds/", {
-          method: "GET",
-          headers: {
-            "Authorization": `Bearer ${userInfo.token.access_token}`,
-          },
-        })
-        const result = await response.json();
-        setResults(result);
-      } catch (error) {
-        console.error("Error submissions:", error);
-      }
+    setOlderRounds([]);
+    setHasMore(rounds.length >= HISTORY_PAGE_SIZE);
+  }, [rounds]);
+
+  const loadMore = useCallback(async () => {
+    if (!hasMore || loading.current) {
+      return;
     }
-    loadState()
-  }, []);
+
+    loading.current = true;
+    try {
+      const offset = rounds.length + olderRounds.length;
+      const response = await fetch(`/rounds?offset=${offset}&limit=${HISTORY_PAGE_SIZE}`, {
+        method: "GET",
+        headers: {
+          "Authorization": `Bearer ${userInfo.token.access_token}`,
+        },
+      });
+      const page = await response.json();
+      setOlderRounds(olderRounds => [...olderRounds, ...page]);
+      setHasMore(page.length >= HISTORY_PAGE_SIZE);
+    } catch (error) {
+      console.error("Error loading rounds:", error);
+      setHasMore(false);
+    } finally {
+      loading.current = false;
+    }
+  }, [rounds, olderRounds, hasMore]);
 
   return (
     <div className={containerStyles.container}>
@@ -84,9 +131,20 @@ export default function OverView({ setGameState }) {
 
       <hr />
 
+      <Standings results={results} />
+
+      <hr />
+
       <div className={containerStyles.card}>
-        {results.map(data => <div key={data.id} className={containerStyles.card}><ResultView singleRoundData={data} setGameState={setGameState} /></div>)}
-        {results.length === 0 && "No previous rounds (yet)."}
+        <VirtualList
+          items={[...rounds, ...olderRounds]}
+          getKey={data => data.id}
+          renderItem={data => <div className={containerStyles.card}><ResultView singleRoundData={data} setGameState={setGameState} expanded={expanded} toggleExpanded={toggleExpanded} /></div>}
+          estimatedHeight={ESTIMATED_ROUND_HEIGHT_PX}
+          onEndReached={loadMore}
+        />
+        {rounds.length === 0 && "No previous rounds (yet)."}
+        {hasMore && <p className={commonStyles.description}>Loading older rounds...</p>}
       </div>
     </div>
   );
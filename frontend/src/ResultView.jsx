@@ -16,38 +16,52 @@ function Comment({ author, text }) {
 }
 
 
-function SingleResult({ data, setGameState }) {
+function SingleResult({ data, result, isWinner, setGameState, expanded, toggleExpanded }) {
   const userInfo = useContext(UserContext);
 
   return (
     <div className={commonStyles.submissionItem}>
-      <MovieCard movieData={data.movie} />
-      <p className={commonStyles.submissionDescription}>Submitted by: {data.submitting_user.name}</p>
+      {isWinner && <span className={styles.winner}>Winner</span>}
+      {expanded ? <MovieCard movieData={data.movie} /> : <h3>{result.movie_name}</h3>}
+      <p className={commonStyles.submissionDescription}>Submitted by: {result.submitting_user.name}</p>
 
       <div className={styles.entry}>
         <span className={styles.entryTitle}>Score:</span>
-        <span className={styles.score}>{data.voting_users.length}</span>
+        <span className={styles.score}>{result.votes}</span>
       </div>
 
-      <div className={styles.entry}>
-        <span className={styles.entryTitle}>Voted for by:</span>
-        <span className={styles.players}>{data.voting_users.map(data => data.name).join(", ")}</span>
-      </div>
+      {expanded && (
+        <>
+          <div className={styles.entry}>
+            <span className={styles.entryTitle}>Voted for by:</span>
+            <span className={styles.players}>{data.voting_users.map(data => data.name).join(", ")}</span>
+          </div>
 
-      <div className={styles.entry}>
-        <span className={styles.entryTitle}>Comments:</span>
-        <div className={styles.commentList}>{data.comments.map((data, i) => <Comment key={i} author={data.author} text={data.text} />)}</div>
-      </div>
+          <div className={styles.entry}>
+            <span className={styles.entryTitle}>Comments:</span>
+            <div className={styles.commentList}>{data.comments.map((data, i) => <Comment key={i} author={data.author} text={data.text} />)}</div>
+          </div>
+        </>
+      )}
+
+      <button onClick={() => toggleExpanded(data.id)} className={styles.toggle}>{expanded ? "Hide details" : "Show details"}</button>
     </div>
   );
 }
 
-export default function ResultView({ singleRoundData, setGameState }) {
+// Details of submissions are only rendered once expanded, as most past rounds
+// are just skimmed. `expanded` holds the ids of the expanded submissions.
+// Votes, winners and ranking come from the results computed by the server.
+export default function ResultView({ singleRoundData, setGameState, expanded, toggleExpanded }) {
+  const { results } = singleRoundData;
+  const submissions = new Map(singleRoundData.submissions.map(data => [data.id, data]));
+  const winners = new Set(results.winners);
+
   return (<>
     <h2 className={containerStyles.title}><span className={containerStyles.promptPrefix}>Prompt:</span> "{singleRoundData.prompt}"</h2>
     <p className={commonStyles.description}>The final ranking is in.</p>
     <div className={commonStyles.submissionList}>
-      {singleRoundData.submissions.slice().sort((a, b) => b.voting_users.length - a.voting_users.length).map((data, i) => <SingleResult key={i} data={data} setGameState={setGameState} />)}
+      {results.submissions.map(result => <SingleResult key={result.submission_id} data={submissions.get(result.submission_id)} result={result} isWinner={winners.has(result.submission_id)} setGameState={setGameState} expanded={expanded.has(result.submission_id)} toggleExpanded={toggleExpanded} />)}
     </div>
   </>);
 }
\ No newline at end of file
@@ -1,36 +1,62 @@
-import { useRef, useState, useEffect, useContext } from 'react';
+import { useEffect, useRef, useState, useContext } from 'react';
 import { UserContext } from './UserContext.js';
 
 import WaitingView from "./WaitingView.jsx";
 
 import commonStyles from "./CommonStyles.module.css";
 
+// Movie metadata is fetched once the title stopped changing for this long,
+// unless it is too short to mean much yet.
+const PREFETCH_DELAY_MS = 500;
+const PREFETCH_MIN_LENGTH = 3;
+
 
 export default function SubmissionView({ gameState, setGameState }) {
-  const [prompt, setPrompt] = useState([]);
   const [isLoading, setIsLoading] = useState(false);
   const inputRefs = useRef({});
   const userInfo = useContext(UserContext);
+  const prefetchTimer = useRef(null);
+  const prefetchRequest = useRef(null);
+
+  const cancelPrefetch = () => {
+    clearTimeout(prefetchTimer.current);
+    prefetchRequest.current?.abort();
+  };
+
+  // Nothing is prefetched anymore once the view is gone.
+  useEffect(() => cancelPrefetch, []);
+
+  const schedulePrefetch = () => {
+    cancelPrefetch();
+
+    // Sent as typed, so that the submission finds exactly this title.
+    const name = inputRefs.current.movie.value;
+    if (name.trim().length < PREFETCH_MIN_LENGTH) {
+      return;
+    }
 
-  useEffect(() => {
-    const loadState = async () => {
+    prefetchTimer.current = setTimeout(async () => {
+      const controller = new AbortController();
+      prefetchRequest.current = controller;
       try {
-        const response = await fetch("http://localhost:8000/round/", {
-          method: "GET",
+        await fetch("/submissions/prefetch", {
+          method: "POST",
           headers: {
+            "Content-Type": "application/json",
             "Authorization": `Bearer ${userInfo.token.access_token}`,
           },
-        })
-        const result = await response.json();
-        setPrompt(result.prompt)
+          body: JSON.stringify({ name }),
+          signal: controller.signal,
+        });
       } catch (error) {
-        console.error("Error game state:", error);
+        // Only speculative, submitting fetches the movie anyway.
       }
-    }
-    loadState()
-  }, []);
+    }, PREFETCH_DELAY_MS);
+  };
 
   const sendSubmission = async () => {
+    cancelPrefetch();
+
     const data = {
       name: inputRefs.current.movie.value,
       comment: inputRefs.current.comment.value,
@@ -38,7 +64,7 @@ export default function SubmissionView({ gameState, setGameState }) {
 
     try {
       setIsLoading(true);
-      const response = await fetch("http://localhost:8000/submissions/", {
+      const response = await fetch("/submissions/", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -47,14 +73,7 @@ export default function SubmissionView({ gameState, setGameState }) {
         body: JSON.stringify(data)
       });
 
-      const state_response = await fetch("http://localhost:8000/state/", {
-        method: "GET",
-        headers: {
-          "Authorization": `Bearer ${userInfo.token.access_token}`,
-        },
-      })
-      const state_result = await state_response.json();
-      setGameState(state_result)
+      setGameState();
     } catch (error) {
       console.error("Error sending submission:", error);
     } finally {
@@ -74,6 +93,7 @@ export default function SubmissionView({ gameState, setGameState }) {
         placeholder="Movie"
         ref={(el) => (inputRefs.current.movie = el)}
         className={commonStyles.input}
+        onChange={schedulePrefetch}
         required
         disabled={isLoading}
       />
@@ -0,0 +1,99 @@
+import { useState, useEffect, useLayoutEffect, useCallback, useRef } from "react";
+
+import styles from "./VirtualList.module.css";
+
+
+// Items rendered beyond the edges of the window, in pixels.
+const OVERSCAN_PX = 1000;
+
+function MeasuredItem({ itemKey, setHeight, children }) {
+  const ref = useRef(null);
+
+  useLayoutEffect(() => {
+    const observer = new ResizeObserver(() => setHeight(itemKey, ref.current.offsetHeight));
+    observer.observe(ref.current);
+    return () => observer.disconnect();
+  }, [itemKey, setHeight]);
+
+  return <div ref={ref} className={styles.item}>{children}</div>;
+}
+
+// Renders only the items close to the visible part of the page, the others
+// are replaced by space of their last measured or else estimated height.
+// `onEndReached` is called once the last item comes close.
+export default function VirtualList({ items, getKey, renderItem, estimatedHeight, onEndReached }) {
+  const containerRef = useRef(null);
+  const heights = useRef(new Map());
+  const [, setMeasured] = useState(0);
+  const [viewport, setViewport] = useState({ top: 0, bottom: window.innerHeight });
+
+  const setHeight = useCallback((key, height) => {
+    if (heights.current.get(key) !== height) {
+      heights.current.set(key, height);
+      setMeasured(measured => measured + 1);
+    }
+  }, []);
+
+  useEffect(() => {
+    let frame = null;
+    const update = () => {
+      frame = null;
+      const top = -containerRef.current.getBoundingClientRect().top;
+      setViewport({ top, bottom: top + window.innerHeight });
+    };
+    const schedule = () => {
+      if (frame === null) {
+        frame = requestAnimationFrame(update);
+      }
+    };
+
+    update();
+    window.addEventListener("scroll", schedule, { passive: true });
+    window.addEventListener("resize", schedule);
+    return () => {
+      cancelAnimationFrame(frame);
+      window.removeEventListener("scroll", schedule);
+      window.removeEventListener("resize", schedule);
+    };
+  }, []);
+
+  // Offsets are plain sums, only the rendered items cost anything.
+  let offset = 0;
+  let start = items.length;
+  let end = items.length;
+  let paddingTop = 0;
+  for (let i = 0; i < items.length; i++) {
+    const height = heights.current.get(getKey(items[i])) ?? estimatedHeight;
+    if (start === items.length && offset + height >= viewport.top - OVERSCAN_PX) {
+      start = i;
+      paddingTop = offset;
+    }
+    if (offset > viewport.bottom + OVERSCAN_PX) {
+      end = i;
+      break;
+    }
+    offset += height;
+  }
+
+  let paddingBottom = 0;
+  for (let i = end; i < items.length; i++) {
+    paddingBottom += heights.current.get(getKey(items[i])) ?? estimatedHeight;
+  }
+
+  const endReached = end === items.length;
+  useEffect(() => {
+    if (endReached && onEndReached) {
+      onEndReached();
+    }
+  }, [endReached, items.length, onEndReached]);
+
+  return (
+    <div ref={containerRef} className={styles.list} style={{ paddingTop, paddingBottom }}>
+      {items.slice(start, end).map(item => (
+        <MeasuredItem key={getKey(item)} itemKey={getKey(item)} setHeight={setHeight}>
+          {renderItem(item)}
+        </MeasuredItem>
+      ))}
+    </div>
+  );
+}
@@ -1,4 +1,4 @@
-import { useState, useEffect, useContext, useRef } from "react";
+import { useContext, useRef } from "react";
 import { UserContext } from './UserContext.js';
 
 import MovieCard from "./MovieCard.jsx";
@@ -21,7 +21,7 @@ function SingleSubmission({ data, setGameState, inputRefs }) {
       }
 
       try {
-        const response = await fetch(`http://localhost:8000/vote/`, {
+        const response = await fetch(`/vote/`, {
           method: "POST",
           headers: {
             "Content-Type": "application/json",
@@ -58,29 +58,10 @@ function SingleSubmission({ data, setGameState, inputRefs }) {
   );
 }
 
-export default function VotingView({ gameState, setGameState }) {
-  const userInfo = useContext(UserContext);
-  const [submissions, setSubmissions] = useState([]);
+export default function VotingView({ gameState, setGameState, round }) {
+  const submissions = round ? round.submissions : [];
   const inputRefs = useRef({ comments: {} });
 
-  useEffect(() => {
-    const loadState = async () => {
-      try {
-        const response = await fetch("http://localhost:8000/round/", {
-          method: "GET",
-          headers: {
-            "Authorization": `Bearer ${userInfo.token.access_token}`,
-          },
-        })
-        const result = await response.json();
-        setSubmissions(result.submissions)
-      } catch (error) {
-        console.error("Error submissions:", error);
-      }
-    }
-    loadState()
-  }, []);
-
   if (gameState.player_state === "closed") {
     return <WaitingView message="You have voted for a movie, now wait for the others to do the same." />
   }
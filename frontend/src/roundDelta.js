@@ -0,0 +1,34 @@
+// Applies a change set from `GET /round?since=<version>` to a round.
+// Changes which the round already has are ignored, so applying a delta twice
+// or onto a newer round does no harm.
+export function applyRoundDelta(round, delta) {
+  if (delta.round !== null) {
+    return delta.round;
+  }
+
+  const submissions = round.submissions.map(submission => {
+    const voterIds = new Set(submission.voting_users.map(user => user.id));
+    return {
+      ...submission,
+      voting_users: [
+        ...submission.voting_users,
+        ...delta.votes
+          .filter(vote => vote.submission_id === submission.id && !voterIds.has(vote.user.id))
+          .map(vote => vote.user),
+      ],
+      comments: [
+        ...submission.comments,
+        ...delta.comments.filter(comment => comment.submission_id === submission.id),
+      ],
+    };
+  });
+
+  const submissionIds = new Set(submissions.map(submission => submission.id));
+  return {
+    ...round,
+    submissions: [
+      ...submissions,
+      ...delta.submissions.filter(submission => !submissionIds.has(submission.id)),
+    ],
+  };
+}
@@ -1,6 +1,14 @@
+import { readFileSync } from 'node:fs';
 import { defineConfig } from 'vite';
 import react from '@vitejs/plugin-react';
 
+// The built app is served by the backend, the dev server forwards API calls.
+// The backend tests check that the list covers all of its routes.
+const apiPaths = JSON.parse(readFileSync(new URL('./apiPaths.json', import.meta.url)));
+
 export default defineConfig({
-  plugins: [react()]
+  plugins: [react()],
+  server: {
+    proxy: Object.fromEntries(apiPaths.map((path) => [path, 'http://localhost:8000']))
+  }
 });